@@ -0,0 +1,210 @@
+import sys, os, time, tempfile
+sys.path.append(os.getcwd())
+
+from src.slicer.model.model import Model, facet_normals
+from src.slicer.model.sweep import slice_model
+from src.slicer.engine import slice_loops
+from src.slicer.contour import assemble_contours
+from src.slicer.slicer import slice_file, slice_views
+from PIL import Image
+import numpy as np
+
+# Build a torus with about the given number of facets, in mm
+def make_torus(facets, major=20.0, minor=8.0, center=(30.0, 30.0, 10.0)):
+    nv = max(3, int(np.sqrt(facets / 4)))
+    nu = max(3, facets // (2 * nv))
+
+    u = np.linspace(0, 2 * np.pi, nu + 1)[:, None]
+    v = np.linspace(0, 2 * np.pi, nv + 1)[None, :]
+    points = np.stack(((major + minor * np.cos(v)) * np.cos(u) + center[0],
+                       (major + minor * np.cos(v)) * np.sin(u) + center[1],
+                       minor * np.sin(v) + np.zeros_like(u) + center[2]), axis=-1)
+
+    a = points[:-1, :-1].reshape(-1, 3)
+    b = points[1:, :-1].reshape(-1, 3)
+    c = points[1:, 1:].reshape(-1, 3)
+    d = points[:-1, 1:].reshape(-1, 3)
+    return np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1)))
+
+# Build a closed prism standing along z on a star of points, in mm
+# Every wall is split along its diagonal, as exported meshes are
+def make_prism(points=12, outer=20.0, inner=12.0, height=40.0, center=(30.0, 30.0, 0.0)):
+    angles = np.linspace(0, 2 * np.pi, 2 * points, endpoint=False)
+    radii = np.where(np.arange(2 * points) % 2 == 0, outer, inner)
+    ring = np.stack((radii * np.cos(angles) + center[0], radii * np.sin(angles) + center[1]), axis=1)
+
+    bottom = np.concatenate((ring, np.full((len(ring), 1), center[2])), axis=1)
+    top = bottom + (0.0, 0.0, height)
+    a, b = bottom, np.roll(bottom, -1, axis=0)
+    c, d = np.roll(top, -1, axis=0), top
+
+    # Caps are fans around the center, wound to face away from the prism
+    low = np.tile(np.array(center, dtype=np.float64), (len(ring), 1))
+    high = low + (0.0, 0.0, height)
+    return np.concatenate((np.stack((a, b, c), axis=1), np.stack((a, c, d), axis=1),
+                           np.stack((low, b, a), axis=1), np.stack((high, d, c), axis=1)))
+
+# Write facets as an ASCII STL file
+def write_ascii(path, facets, name="benchmark"):
+    normals = np.cross(facets[:, 1] - facets[:, 0], facets[:, 2] - facets[:, 0])
+    values = np.concatenate((normals[:, None], facets), axis=1).reshape(-1, 12)
+
+    facet = ("facet normal %e %e %e\n outer loop\n"
+             "  vertex %e %e %e\n  vertex %e %e %e\n  vertex %e %e %e\n"
+             " endloop\nendfacet\n")
+
+    with open(path, 'w') as f:
+        f.write("solid %s\n" % name)
+        for row in values:
+            f.write(facet % tuple(row))
+        f.write("endsolid %s\n" % name)
+
+# Time loading ASCII STL files of growing size, the time per facet should stay flat
+def benchmark_ascii(sizes=(25000, 50000, 100000, 200000, 400000)):
+    print("Facets\tMB\tSeconds\tus/facet")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            path = os.path.join(folder, "torus_%d.stl" % size)
+            write_ascii(path, make_torus(size))
+
+            tic = time.time()
+            model = Model(path=path)
+            toc = time.time() - tic
+
+            print("%d\t%.1f\t%.3f\t%.2f" % (len(model), os.path.getsize(path) / 1e6,
+                                            toc, toc / len(model) * 1e6))
+
+# Time cutting and linking layers with each backend, then a full slice_file run
+# The numba engine is warmed up first so compiling is not counted
+# Resolutions stay under 255 layers, past that layer_colors leaves every layer black
+def benchmark_backends(facets=100000, resolution=0.1):
+    # Same units and placement parse_file gives, inches from the origin
+    torus = make_torus(facets, center=(28.0, 28.0, 8.0)) / 25.4
+    model = Model.from_arrays(torus, facet_normals(torus))
+    planes = np.linspace(0.001, model.zmax - 0.001, int(model.zmax / (resolution / 25.4)) + 1)
+    model.topology()
+    slice_loops(model, 'z', planes[:2])
+    assemble_contours(np.zeros((0, 2, 2)))
+
+    tic = time.time()
+    segments, offsets = slice_model(model, 'z', planes)
+    for j in range(len(planes)):
+        assemble_contours(segments[offsets[j]:offsets[j + 1]])
+    python_time = time.time() - tic
+
+    tic = time.time()
+    slice_loops(model, 'z', planes)
+    numba_time = time.time() - tic
+
+    print("%d layers of %d facets cut and linked: python %.3fs, numba %.3fs (%.0fx)"
+          % (len(planes), len(model), python_time, numba_time, python_time / numba_time))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for backend in ('python', 'numba'):
+            tic = time.time()
+            slice_file(resolution, model, 'z', 256, 256, 80, 80,
+                       output=os.path.join(folder, backend + '.png'), backend=backend)
+            print("\nslice_file with %s backend: %.3fs" % (backend, time.time() - tic))
+
+        python = np.asarray(Image.open(os.path.join(folder, 'python.png')))
+        numba = np.asarray(Image.open(os.path.join(folder, 'numba.png')))
+        print("%d pixels differ between backends, brightest gray %d"
+              % (np.count_nonzero(np.any(python != numba, axis=2)), python[:, :, 0].max()))
+
+# Time slice_file over growing worker pools, layers per second should grow with the cores
+def benchmark_workers(facets=100000, resolution=0.1, pools=(1, 2, 4, 8)):
+    torus = make_torus(facets, center=(28.0, 28.0, 8.0)) / 25.4
+    model = Model.from_arrays(torus, facet_normals(torus))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for workers in pools:
+            tic = time.time()
+            slice_file(resolution, model, 'z', 256, 256, 80, 80,
+                       output=os.path.join(folder, '%d.png' % workers), workers=workers)
+            print("\nslice_file with %d workers: %.3fs" % (workers, time.time() - tic))
+
+# Time slicing against the depth buffer projection for the same image, on a torus and
+# on a star prism whose rays run through gaps between its points, and count the pixels
+# the two modes disagree on
+# Resolutions stay under 255 layers, past that layer_colors leaves every layer black
+def benchmark_depth(facets=200000, resolution=0.25):
+    torus = make_torus(facets, center=(28.0, 28.0, 8.0)) / 25.4
+    star = make_prism() / 25.4
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, part in (('torus', torus), ('star', star)):
+            model = Model.from_arrays(part, facet_normals(part))
+            times = {}
+            for mode in ('slices', 'depth'):
+                tic = time.time()
+                slice_file(resolution, model, 'x', 512, 512, 200, 200,
+                           output=os.path.join(folder, mode + '.png'), mode=mode)
+                times[mode] = time.time() - tic
+
+            slices = np.asarray(Image.open(os.path.join(folder, 'slices.png')))
+            depth = np.asarray(Image.open(os.path.join(folder, 'depth.png')))
+            print("\n%s slices %.3fs, depth %.3fs, %d pixels differ, brightest gray %d"
+                  % (name, times['slices'], times['depth'],
+                     np.count_nonzero(np.any(slices != depth, axis=2)), slices[:, :, 0].max()))
+
+# Time slicing six views of a detailed model with and without simplifying it first,
+# and count the pixels the simplified images get wrong
+def benchmark_simplify(facets=1600000, resolution=0.4):
+    torus = make_torus(facets, center=(28.0, 28.0, 8.0)) / 25.4
+    model = Model.from_arrays(torus, facet_normals(torus))
+
+    with tempfile.TemporaryDirectory() as folder:
+        times = {}
+        for simplify in (None, True):
+            views = [(direction, reverse, os.path.join(folder, '%s_%s_%s.png' % (simplify, direction, reverse)))
+                     for direction in 'xyz' for reverse in (False, True)]
+            tic = time.time()
+            slice_views(resolution, model, views, 512, 512, 200, 200, simplify=simplify)
+            times[simplify] = time.time() - tic
+
+        wrong = filled = 0
+        for direction in 'xyz':
+            for reverse in (False, True):
+                full = np.asarray(Image.open(os.path.join(folder, 'None_%s_%s.png' % (direction, reverse))))
+                simple = np.asarray(Image.open(os.path.join(folder, 'True_%s_%s.png' % (direction, reverse))))
+                wrong += np.count_nonzero(np.any(full != simple, axis=2))
+                filled += np.count_nonzero(np.any(full[:, :, :3] > 0, axis=2))
+
+        # The decimation alone at the cell simplify=True picks, half a pixel here
+        tic = time.time()
+        simple, _ = model.decimate(200 / 512 / 2 / 25.4)
+        decimate = time.time() - tic
+
+        print("\nSix views full %.3fs, simplified %.3fs (%.1fx) of which %.3fs decimating %d to %d facets, %d of %d filled pixels differ"
+              % (times[None], times[True], times[None] / times[True], decimate, len(model), len(simple), wrong, filled))
+
+# Time slicing a part with long walls with and without adaptive layers, which must
+# give the same images
+def benchmark_adaptive(facets=100000, resolution=0.1):
+    torus = make_torus(facets, center=(30.0, 30.0, 48.0))
+    part = np.concatenate((make_prism(), torus)) / 25.4
+    model = Model.from_arrays(part, facet_normals(part))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for direction in 'xyz':
+            times = {}
+            for adaptive in (False, True):
+                output = os.path.join(folder, '%s_%s.png' % (direction, adaptive))
+                tic = time.time()
+                slice_file(resolution, model, direction, 512, 512, 200, 200, output=output, adaptive=adaptive)
+                times[adaptive] = time.time() - tic
+
+            uniform = np.asarray(Image.open(os.path.join(folder, '%s_False.png' % direction)))
+            planned = np.asarray(Image.open(os.path.join(folder, '%s_True.png' % direction)))
+            print("\n%s uniform %.3fs, adaptive %.3fs (%.1fx), %d pixels differ"
+                  % (direction, times[False], times[True], times[False] / times[True],
+                     np.count_nonzero(np.any(uniform != planned, axis=2))))
+
+if (__name__ == '__main__'):
+    benchmark_ascii()
+    benchmark_backends()
+    benchmark_workers()
+    benchmark_depth()
+    benchmark_simplify()
+    benchmark_adaptive()
@@ -0,0 +1,263 @@
+import os, json, shutil, hashlib, tempfile
+from collections import OrderedDict
+import numpy as np
+
+from src.slicer.model.model import Model
+from src.slicer.model.stl import BLOCK_SIZE
+from src.slicer.contour import Contours
+
+# Bump when the layout of cached entries changes, older entries are then missed
+CACHE_VERSION = 1
+
+# Hex digest of the contents of a file, read block by block
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Hex digest of file contents already in memory
+def content_digest(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+# Hex digest identifying a cache entry from a content digest and the parameters used
+def make_key(digest, **params):
+    key = json.dumps({'digest': digest, 'version': CACHE_VERSION, 'params': params}, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+# Size in bytes of all files under a folder
+def folder_size(folder):
+    size = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            size += os.path.getsize(os.path.join(root, name))
+    return size
+
+# Folder of cache entries on disk, each entry being a folder named by its key
+# When the entries go over max_bytes, the least recently used are removed first
+class DiskCache(object):
+
+    def __init__(self, folder, max_bytes=1 << 30):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+
+    def entry(self, key):
+        return os.path.join(self.folder, key)
+
+    # Get the folder of an entry and mark it as used, None if it is not cached
+    def lookup(self, key):
+        path = self.entry(key)
+        if not os.path.isdir(path):
+            return None
+
+        os.utime(path)
+        return path
+
+    # Make an empty folder to write a new entry into before commit
+    def staging(self):
+        return tempfile.mkdtemp(prefix='.tmp-', dir=self.folder)
+
+    # Move a written staging folder into place as the entry for key
+    def commit(self, key, staging):
+        path = self.entry(key)
+        if os.path.isdir(path):
+            shutil.rmtree(staging)
+        else:
+            os.replace(staging, path)
+            os.utime(path)
+
+        self.evict()
+
+    # Remove the least recently used entries until the cache fits its budget
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.folder):
+            path = self.entry(name)
+            if os.path.isdir(path) and not name.startswith('.'):
+                entries.append((os.path.getmtime(path), folder_size(path), path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.folder):
+            shutil.rmtree(self.entry(name), ignore_errors=True)
+
+# Disk cache of processed models, stored as raw .npy arrays
+# Cached models are memory mapped back in, so loading takes milliseconds
+class MeshCache(DiskCache):
+
+    # Key of a model from the digest of its STL file and how it was transformed
+    def key(self, digest, **params):
+        return make_key(digest, kind='mesh', **params)
+
+    # Load a cached model, None if it is not cached
+    def load(self, key):
+        path = self.lookup(key)
+        if path is None:
+            return None
+
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+
+            # The indexed mesh is left out for models that were memory mapped
+            arrays = {}
+            for name in ('facets', 'normals', 'vertices', 'faces'):
+                if name in ('facets', 'normals') or os.path.exists(os.path.join(path, name + '.npy')):
+                    arrays[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        return Model.from_arrays(name=meta['name'].encode('latin-1'), tolerance=meta['tolerance'],
+                                 extents=meta['extents'], **arrays)
+
+    # Write a model to the cache, together with its indexed mesh
+    # Welding reads the whole model, so a memory mapped model only gets its indexed mesh
+    # stored if it was already welded, otherwise it is welded again after loading
+    def store(self, key, model):
+        staging = self.staging()
+
+        # Write the facets chunk by chunk so memory mapped models are never loaded whole here
+        facets = np.lib.format.open_memmap(os.path.join(staging, 'facets.npy'), mode='w+',
+                                           dtype=np.float64, shape=(len(model), 3, 3))
+        normals = np.lib.format.open_memmap(os.path.join(staging, 'normals.npy'), mode='w+',
+                                            dtype=np.float64, shape=(len(model), 3))
+        start = 0
+        for chunk, chunk_normals in model.chunks():
+            facets[start:start + len(chunk)] = chunk
+            normals[start:start + len(chunk)] = chunk_normals
+            start += len(chunk)
+        facets.flush()
+        normals.flush()
+        del facets, normals
+
+        if not model.memory_mapped or model.vertices is not None:
+            vertices, faces = model.weld(model.weld_tolerance)
+            np.save(os.path.join(staging, 'vertices.npy'), vertices)
+            np.save(os.path.join(staging, 'faces.npy'), faces)
+
+        name = model.name if isinstance(model.name, bytes) else model.name.encode('latin-1')
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump({'name': name.decode('latin-1'), 'tolerance': model.weld_tolerance,
+                       'extents': model.extent_sums()}, f)
+
+        self.commit(key, staging)
+
+# Pack per-layer Contours into flat arrays, layers[j]:layers[j+1] being the loops of layer j
+def pack_layers(layers):
+    points = [contours.points for contours in layers]
+    closed = [contours.closed for contours in layers]
+    counts = [len(contours) for contours in layers]
+
+    offsets = [np.zeros(1, dtype=np.int64)]
+    start = 0
+    for contours in layers:
+        offsets.append(contours.offsets[1:] + start)
+        start += len(contours.points)
+
+    loops = np.zeros(len(layers) + 1, dtype=np.int64)
+    np.cumsum(counts, out=loops[1:])
+    return {'points': np.concatenate(points) if points else np.zeros((0, 2)),
+            'offsets': np.concatenate(offsets),
+            'closed': np.concatenate(closed) if closed else np.zeros(0, dtype=bool),
+            'layers': loops}
+
+def unpack_layers(points, offsets, closed, layers):
+    out = []
+    for j in range(len(layers) - 1):
+        a, b = layers[j], layers[j + 1]
+        out.append(Contours(points[offsets[a]:offsets[b]], offsets[a:b + 1] - offsets[a], closed[a:b]))
+    return out
+
+# Cache of slice_file results, the projection image, its metadata and the layer Contours
+# Entries live on disk and the most recent ones also in memory, each part of the cache
+# dropping its least recently used entries past its byte budget
+# hits and misses count lookups, memory_hits being the hits served without the disk
+class SliceCache(DiskCache):
+
+    def __init__(self, folder, max_bytes=1 << 30, memory_bytes=256 << 20):
+        DiskCache.__init__(self, folder, max_bytes)
+        self.memory_bytes = memory_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    # Key of a slicing run from the digest of its STL file and every setting used
+    def key(self, digest, **params):
+        return make_key(digest, kind='slices', **params)
+
+    # Hit and miss counts so far
+    def stats(self):
+        return {'hits': self.hits, 'memory_hits': self.memory_hits, 'misses': self.misses,
+                'memory_bytes': self.memory_size, 'disk_bytes': folder_size(self.folder)}
+
+    # Keep an entry in memory, dropping the least recently used past the budget
+    def remember(self, key, entry):
+        if key in self.memory:
+            self.memory_size -= self.memory.pop(key)[3]
+        self.memory[key] = entry
+        self.memory_size += entry[3]
+
+        while self.memory_size > self.memory_bytes and len(self.memory) > 0:
+            self.memory_size -= self.memory.popitem(last=False)[1][3]
+
+    # Load a cached result as (png bytes, record, layers), None if it is not cached
+    def load(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return entry[:3]
+
+        path = self.lookup(key)
+        if path is None:
+            self.misses += 1
+            return None
+
+        try:
+            with open(os.path.join(path, 'projection.png'), 'rb') as f:
+                image = f.read()
+            with open(os.path.join(path, 'meta.json')) as f:
+                record = json.load(f)
+
+            layers = None
+            if os.path.isfile(os.path.join(path, 'contours.npz')):
+                with np.load(os.path.join(path, 'contours.npz')) as arrays:
+                    layers = unpack_layers(**arrays)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.remember(key, (image, record, layers, folder_size(path)))
+        return image, record, layers
+
+    # Write a result to the cache, image being the bytes of the projection PNG
+    def store(self, key, image, record, layers=None):
+        staging = self.staging()
+
+        with open(os.path.join(staging, 'projection.png'), 'wb') as f:
+            f.write(image)
+        with open(os.path.join(staging, 'meta.json'), 'w') as f:
+            json.dump(record, f)
+        if layers is not None:
+            np.savez(os.path.join(staging, 'contours.npz'), **pack_layers(layers))
+
+        size = folder_size(staging)
+        self.commit(key, staging)
+        self.remember(key, (image, record, layers, size))
+
+    def clear(self):
+        DiskCache.clear(self)
+        self.memory.clear()
+        self.memory_size = 0
@@ -0,0 +1,218 @@
+from src.slicer.model.vector import TOLERANCE
+from src.slicer.model.topology import row_keys
+from numba import njit
+import numpy as np
+
+# Contours of one layer, each loop a (K,2) array of points in plane coordinates
+# Loops are stored back to back in points, offsets[i]:offsets[i+1] being loop i
+# Closed loops do not repeat their first point, open chains end on their loose point
+class Contours(object):
+
+    def __init__(self, points, offsets, closed):
+        self.points = points
+        self.offsets = offsets
+        self.closed = closed
+        self.parents = None
+        self.depths = None
+
+    # Build from the points of every loop and the loop number of each point
+    @classmethod
+    def from_links(cls, points, loops, closed):
+        offsets = np.zeros(len(closed) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(loops, minlength=len(closed)), out=offsets[1:])
+        return cls(points, offsets, closed)
+
+    def __len__(self):
+        return len(self.closed)
+
+    def __getitem__(self, i):
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __str__(self):
+        return 'Contours: {} loops, {} open chains, {} points'.format(
+            len(self), len(self.open_chains()), len(self.points))
+
+    # Signed area of every loop, positive when it runs counter-clockwise
+    # Open chains are measured as if closed by a straight line
+    def areas(self):
+        if len(self) == 0:
+            return np.zeros(0)
+
+        ends = self.offsets[1:] - 1
+        following = np.arange(1, len(self.points) + 1)
+        following[ends] = self.offsets[:-1]
+
+        x, y = self.points[:, 0], self.points[:, 1]
+        cross = x * y[following] - x[following] * y
+        return np.add.reduceat(cross, self.offsets[:-1]) / 2
+
+    # +1 for counter-clockwise loops, the outside of a solid, -1 for clockwise holes
+    def orientation(self):
+        return np.where(self.areas() >= 0, 1, -1)
+
+    # Indices of the loops that did not close
+    def open_chains(self):
+        return np.flatnonzero(~self.closed)
+
+    # Lower and upper (L,2) corners of the bounding box of every loop
+    def bounds(self):
+        if len(self) == 0:
+            return np.zeros((0, 2)), np.zeros((0, 2))
+        return (np.minimum.reduceat(self.points, self.offsets[:-1], axis=0),
+                np.maximum.reduceat(self.points, self.offsets[:-1], axis=0))
+
+    # Build the containment tree of the loops, cached on first use
+    # parents[i] is the smallest loop around loop i, -1 at the top, and depths[i]
+    # how many loops are around it
+    # Only loops whose box fits in a larger loop's box are tested, each with one point
+    # Candidates are found over the loops sorted by the left of their box, so memory
+    # stays linear in the loops rather than testing every pair of boxes
+    def nesting(self):
+        if self.parents is not None:
+            return self.parents, self.depths
+
+        sizes = np.abs(self.areas())
+        lower, upper = self.bounds()
+
+        # Loops whose box starts within each loop's box from left to right
+        order = np.argsort(lower[:, 0], kind='stable')
+        left = lower[order, 0]
+        starts = np.searchsorted(left, lower[:, 0], side='left')
+        stops = np.searchsorted(left, upper[:, 0], side='right')
+
+        self.parents = np.full(len(self), -1, dtype=np.int64)
+        self.depths = np.zeros(len(self), dtype=np.int64)
+        parent_sizes = np.full(len(self), np.inf)
+        for outer in np.flatnonzero(stops - starts > 1):
+            inner = order[starts[outer]:stops[outer]]
+            inner = inner[np.all((lower[inner] >= lower[outer]) & (upper[inner] <= upper[outer]), axis=1)
+                          & (sizes[inner] < sizes[outer])]
+            if len(inner) == 0:
+                continue
+
+            inner = inner[points_in_loop(self[outer], self.points[self.offsets[inner]])]
+            self.depths[inner] += 1
+
+            closer = inner[sizes[outer] < parent_sizes[inner]]
+            self.parents[closer] = outer
+            parent_sizes[closer] = sizes[outer]
+
+        return self.parents, self.depths
+
+    # Whether every loop is a hole, being inside an odd number of loops
+    def holes(self):
+        return self.nesting()[1] % 2 == 1
+
+    # Indices of the loops directly inside loop i, -1 for the top level loops
+    def children(self, i):
+        return np.flatnonzero(self.nesting()[0] == i)
+
+# Even-odd test of (C,2) points against one (K,2) loop
+def points_in_loop(loop, points):
+    a = loop[:, None]
+    b = np.roll(loop, -1, axis=0)[:, None]
+    points = points[None]
+
+    crosses = (a[..., 1] > points[..., 1]) != (b[..., 1] > points[..., 1])
+    rise = np.where(crosses, b[..., 1] - a[..., 1], 1.0)
+    x = a[..., 0] + (points[..., 1] - a[..., 1]) * (b[..., 0] - a[..., 0]) / rise
+    return np.count_nonzero(crosses & (points[..., 0] < x), axis=0) % 2 == 1
+
+# Link segments into loops through their end keys
+# Writes the points of each loop into points, its loop number into loops and
+# whether it closed into closed, open chains also get their final point
+# Returns the number of points and loops written
+@njit(cache=True)
+def link_layer(segments, keys, m, points, loops, closed):
+    flat = keys[:m].ravel()
+    order = np.argsort(flat, kind='mergesort')
+
+    # partner[2 * s + e] is the end joined to end e of segment s, -1 if none
+    partner = np.full(2 * m, -1, dtype=np.int64)
+    i = 0
+    while i < 2 * m - 1:
+        if flat[order[i]] == flat[order[i + 1]]:
+            partner[order[i]] = order[i + 1]
+            partner[order[i + 1]] = order[i]
+            i += 2
+        else:
+            i += 1
+
+    visited = np.zeros(m, dtype=np.bool_)
+    w = 0
+    loop = 0
+
+    # Walk open chains from their loose start first, then the closed loops
+    # Loops start on a segment of some length, as one shrunk to a corner on the
+    # plane has no direction to walk the loop in
+    for heads in range(3):
+        for s in range(m):
+            if visited[s] or (heads == 0 and partner[2 * s] >= 0):
+                continue
+            if heads == 1 and segments[s, 0, 0] == segments[s, 1, 0] and segments[s, 0, 1] == segments[s, 1, 1]:
+                continue
+
+            current = s
+            enter = 0
+            closed[loop] = False
+            while True:
+                visited[current] = True
+                points[w, 0] = segments[current, enter, 0]
+                points[w, 1] = segments[current, enter, 1]
+                loops[w] = loop
+                w += 1
+
+                q = partner[2 * current + 1 - enter]
+                if q < 0:
+                    points[w, 0] = segments[current, 1 - enter, 0]
+                    points[w, 1] = segments[current, 1 - enter, 1]
+                    loops[w] = loop
+                    w += 1
+                    break
+                if visited[q // 2]:
+                    closed[loop] = q == 2 * s
+                    break
+
+                current = q // 2
+                enter = q % 2
+            loop += 1
+
+    return w, loop
+
+# Key every segment end by its point rounded to tolerance
+# Ends closer than tolerance share a key, barring the rare pair either side of a rounding step
+def endpoint_keys(segments, tolerance=TOLERANCE):
+    ends = np.round(np.asarray(segments).reshape(-1, 2) / tolerance).astype(np.int64)
+    if len(ends) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    ends -= ends.min(axis=0)
+    _, keys = np.unique(row_keys(ends, int(ends.max()) + 1), return_inverse=True)
+    return keys.reshape(-1, 2).astype(np.int64)
+
+# Link the (M,2,2) segments of one layer into Contours in linear time
+# keys gives an (M,2) id for both ends of every segment, ends with the same id are
+# joined, by default ends are keyed on their rounded point
+def assemble_contours(segments, keys=None, tolerance=TOLERANCE):
+    segments = np.ascontiguousarray(segments, dtype=np.float64).reshape(-1, 2, 2)
+    if keys is None:
+        keys = endpoint_keys(segments, tolerance)
+
+        # Segments shrunk to a corner on the plane join nothing by point, and would
+        # otherwise pair their two ends with each other as loops of their own
+        kept = keys[:, 0] != keys[:, 1]
+        segments = np.ascontiguousarray(segments[kept])
+        keys = keys[kept]
+    keys = np.ascontiguousarray(keys, dtype=np.int64)
+
+    m = len(segments)
+    points = np.empty((2 * m, 2))
+    loops = np.empty(2 * m, dtype=np.int64)
+    closed = np.empty(m, dtype=np.bool_)
+    w, count = link_layer(segments, keys, m, points, loops, closed)
+
+    return Contours.from_links(points[:w], loops[:w], closed[:count])
@@ -0,0 +1,77 @@
+import os
+from PIL import Image
+import numpy as np
+
+# Elevation masks of one projection image, as made by generate_print_height_image
+# The projection is loaded once, the mask at an elevation is the projection with the
+# rectangle of rows still above that elevation blacked out, so each mask is only a
+# row cutoff on the same array and nothing is drawn or read from disk per elevation
+class ElevationMasks(object):
+
+    def __init__(self, image, x, y, x_span, y_span, image_size_mm=200):
+        width, height = image.size
+
+        # The projection over black, as the masks are drawn
+        base = Image.new('RGB', (width, height), color='black')
+        base.paste(image, (0, 0), image if image.mode == 'RGBA' else None)
+        self.pixels = np.asarray(base)
+
+        self.x = x
+        self.y = y
+        self.image_size_mm = image_size_mm
+        self.height = height
+        self.x_span_pixels = int(x_span * width / image_size_mm)
+        self.y_span_pixels = int(y_span * height / image_size_mm)
+
+        # Columns of the rectangle, its right edge is drawn one past the span
+        self.columns = slice(x, max(x, x + self.x_span_pixels + 2))
+
+    # Last row blacked out at an elevation in mm, the rectangle runs from row y to it
+    def cutoff(self, elevation):
+        print_height_pixels = int(elevation * self.height / self.image_size_mm)
+        return self.y + self.y_span_pixels - print_height_pixels
+
+    # (H,W,3) uint8 mask at an elevation in mm
+    def mask(self, elevation):
+        out = self.pixels.copy()
+        out[self.y:max(self.y, self.cutoff(elevation) + 1), self.columns] = 0
+        return out
+
+    # (N,H,W,3) uint8 masks at every elevation in one vectorized pass
+    def stack(self, elevations):
+        cutoffs = np.array([self.cutoff(elevation) for elevation in elevations], dtype=np.int64)
+        rows = np.arange(self.pixels.shape[0])
+        covered = (rows[None] >= self.y) & (rows[None] <= cutoffs[:, None])
+
+        keep = np.ones((len(cutoffs),) + self.pixels.shape[:2], dtype=bool)
+        keep[:, :, self.columns] = ~covered[:, :, None]
+        return self.pixels[None] * keep[..., None]
+
+    # Elevations from 0 up to but not including top, step mm apart
+    def elevations(self, top, step):
+        elevations = []
+        elevation = 0.0
+        while (elevation < top):
+            elevations.append(elevation)
+            elevation += step
+        return elevations
+
+    # Yield (elevation, mask) pairs, each mask made only when reached
+    def items(self, elevations):
+        for elevation in elevations:
+            yield elevation, self.mask(elevation)
+
+    # Write all masks to one compressed .npz with their elevations
+    def save_npz(self, path, elevations):
+        np.savez_compressed(path, masks=self.stack(elevations), elevations=np.asarray(elevations))
+
+    # Write all masks to one multi-page TIFF, a page per elevation
+    def save_tiff(self, path, elevations):
+        pages = [Image.fromarray(mask) for _, mask in self.items(elevations)]
+        if len(pages) > 0:
+            pages[0].save(path, save_all=True, append_images=pages[1:], compression='tiff_deflate')
+
+    # Write a PNG per elevation into folder, named by the elevation
+    def save_pngs(self, folder, elevations):
+        for elevation, mask in self.items(elevations):
+            Image.fromarray(mask).save(os.path.join(folder, str(elevation) + '.png'))
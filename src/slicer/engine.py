@@ -0,0 +1,114 @@
+from src.slicer.model.triangle import AXES, PLANE_COORDS
+from src.slicer.model.sweep import SweepIndex
+from src.slicer.contour import Contours, link_layer
+from numba import njit, prange
+import numpy as np
+
+# Compiled slicing engine
+# Layers are spread over all cores with prange, each one is intersected and its
+# segments linked into loops without going back to the interpreter
+# Segment ends are linked through the ids of the mesh edges they lie on, so
+# a layer costs one sort of its segment ends
+
+# Intersect the facets listed for one layer with its plane
+# Fills segments (M,2,2) in plane coordinates and the mesh edge id of both ends
+# Returns the number of segments found
+@njit(cache=True)
+def intersect_layer(facets, face_edges, axis, u, v, plane, layer_facets, segments, keys):
+    m = 0
+    for f in layer_facets:
+        found = 0
+        for side in range(3):
+            a = side
+            b = (side + 1) % 3
+            ha = facets[f, a, axis] - plane
+            hb = facets[f, b, axis] - plane
+
+            # A corner on the plane counts as above it
+            if (ha >= 0.0) != (hb >= 0.0):
+                t = ha / (ha - hb)
+                segments[m, found, 0] = facets[f, a, u] + t * (facets[f, b, u] - facets[f, a, u])
+                segments[m, found, 1] = facets[f, a, v] + t * (facets[f, b, v] - facets[f, a, v])
+                keys[m, found] = face_edges[f, side]
+                found += 1
+
+        if found != 2:
+            continue
+
+        # Orient the segment so the facet normal points to its right
+        d1u = facets[f, 1, u] - facets[f, 0, u]
+        d1v = facets[f, 1, v] - facets[f, 0, v]
+        d1a = facets[f, 1, axis] - facets[f, 0, axis]
+        d2u = facets[f, 2, u] - facets[f, 0, u]
+        d2v = facets[f, 2, v] - facets[f, 0, v]
+        d2a = facets[f, 2, axis] - facets[f, 0, axis]
+        nu = d1v * d2a - d1a * d2v
+        nv = d1a * d2u - d1u * d2a
+        if axis == 1:
+            nu = -nu
+            nv = -nv
+
+        du = segments[m, 1, 0] - segments[m, 0, 0]
+        dv = segments[m, 1, 1] - segments[m, 0, 1]
+        if du * -nv + dv * nu < 0.0:
+            for c in range(2):
+                segments[m, 0, c], segments[m, 1, c] = segments[m, 1, c], segments[m, 0, c]
+            keys[m, 0], keys[m, 1] = keys[m, 1], keys[m, 0]
+
+        m += 1
+
+    return m
+
+# Slice and link every layer in parallel
+# Layer j looks at pair_facets[pair_offsets[j]:pair_offsets[j+1]] and writes up to
+# twice that many points from 2 * pair_offsets[j] in points and loops, and as many
+# loops from pair_offsets[j] in closed
+@njit(parallel=True, cache=True)
+def slice_layers(facets, face_edges, axis, u, v, planes, pair_offsets, pair_facets, points, loops, closed, counts):
+    for j in prange(len(planes)):
+        start = pair_offsets[j]
+        stop = pair_offsets[j + 1]
+        n = stop - start
+
+        segments = np.empty((n, 2, 2))
+        keys = np.empty((n, 2), dtype=np.int64)
+        m = intersect_layer(facets, face_edges, axis, u, v, planes[j],
+                            pair_facets[start:stop], segments, keys)
+
+        counts[j, 0], counts[j, 1] = link_layer(segments, keys, m, points[2 * start:2 * stop],
+                                                loops[2 * start:2 * stop], closed[start:stop])
+
+# Slice a model at a stack of planes along an axis with the compiled engine
+# Unlike slice_model this does not stream, the whole model is read into memory and
+# welded for its topology, memory mapped or not
+# Returns the Contours of every plane, in plane coordinates
+def slice_loops(model, axis, planes):
+    axis = AXES.get(axis, axis)
+    u, v = PLANE_COORDS[axis]
+    planes = np.asarray(planes, dtype=np.float64)
+
+    facets, _ = model.read_facets(0, len(model))
+    facets = np.ascontiguousarray(facets)
+    face_edges = model.topology().face_edges
+
+    # Facets reaching each plane, in the caller's plane order
+    sweep = SweepIndex(model, axis, planes)
+    pair_facets = sweep.facet_ids
+    pair_offsets = sweep.offsets
+
+    points = np.empty((2 * len(pair_facets), 2))
+    loops = np.empty(2 * len(pair_facets), dtype=np.int64)
+    closed = np.empty(len(pair_facets), dtype=np.bool_)
+    counts = np.zeros((len(planes), 2), dtype=np.int64)
+    slice_layers(facets, face_edges, axis, u, v, planes, pair_offsets, pair_facets,
+                 points, loops, closed, counts)
+
+    layers = []
+    for j in range(len(planes)):
+        start = pair_offsets[j]
+        w, count = counts[j]
+        layers.append(Contours.from_links(points[2 * start:2 * start + w],
+                                          loops[2 * start:2 * start + w],
+                                          closed[start:start + count]))
+
+    return layers
@@ -0,0 +1,71 @@
+import os, json
+import numpy as np
+
+# Which pixels of an image array are drawn on
+# Gray images count anything but 0, RGB anything but black and RGBA anything but
+# opaque black, the background the slicer composites onto
+def filled_pixels(pixels):
+    pixels = np.asarray(pixels)
+    if pixels.ndim == 2:
+        return pixels != 0
+    if pixels.shape[2] == 4:
+        return np.any(pixels[:, :, :3] != 0, axis=2) | (pixels[:, :, 3] != 255)
+    return np.any(pixels != 0, axis=2)
+
+# Bounding box, filled area, centroid and the extent of every row and column of an
+# image array, in one vectorized pass
+# bbox is (left, top, right, bottom) with right and bottom exclusive, None if empty
+# rows[r] is the first and last filled column of row r and columns[c] the first and
+# last filled row of column c, -1 for both when empty
+# pixel_mm gives the (column, row) size of a pixel in mm to add the area in mm²
+def image_metadata(pixels, pixel_mm=None):
+    filled = filled_pixels(pixels)
+    height, width = filled.shape
+
+    row_any = filled.any(axis=1)
+    column_any = filled.any(axis=0)
+
+    # First and last filled index along each row and column
+    rows = np.full((height, 2), -1, dtype=np.int64)
+    rows[row_any, 0] = np.argmax(filled[row_any], axis=1)
+    rows[row_any, 1] = width - 1 - np.argmax(filled[row_any, ::-1], axis=1)
+    columns = np.full((width, 2), -1, dtype=np.int64)
+    columns[column_any, 0] = np.argmax(filled[:, column_any], axis=0)
+    columns[column_any, 1] = height - 1 - np.argmax(filled[::-1, column_any], axis=0)
+
+    area = int(np.count_nonzero(filled))
+    record = {'width': width, 'height': height, 'area_px': area,
+              'bbox': None, 'centroid': None,
+              'rows': rows.tolist(), 'columns': columns.tolist()}
+
+    if area > 0:
+        filled_rows = np.flatnonzero(row_any)
+        filled_columns = np.flatnonzero(column_any)
+        record['bbox'] = [int(filled_columns[0]), int(filled_rows[0]),
+                          int(filled_columns[-1]) + 1, int(filled_rows[-1]) + 1]
+
+        # Pixel centers, weighted by how many pixels each row and column holds
+        x = float(np.dot(filled.sum(axis=0), np.arange(width) + 0.5) / area)
+        y = float(np.dot(filled.sum(axis=1), np.arange(height) + 0.5) / area)
+        record['centroid'] = [x, y]
+
+    if pixel_mm is not None:
+        record['area_mm2'] = area * pixel_mm[0] * pixel_mm[1]
+
+    return record
+
+# Sidecar file holding the metadata of an output image
+def metadata_path(output):
+    return os.path.splitext(output)[0] + '.json'
+
+def save_metadata(output, record):
+    with open(metadata_path(output), 'w') as f:
+        json.dump(record, f)
+
+# Metadata written next to an output image, None if there is none
+def load_metadata(output):
+    try:
+        with open(metadata_path(output)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
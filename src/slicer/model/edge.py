@@ -14,7 +14,7 @@ class Edge(object):
 
     # If both have same endpoints, they are equal, direction independent
     def __eq__(self, other):
-        assert isinstance(Edge, other), "Trying to compare a non-Edge."
+        assert isinstance(other, Edge), "Trying to compare a non-Edge."
         if self.p[0] == other.p[0] and self.p[1] == other.p[1]:
             return True
         if self.p[0] == other.p[1] and self.p[1] == other.p[0]:
@@ -32,8 +32,8 @@ class Edge(object):
     # Returns tuple of new edge and free point
     def fits(self, index, other):
         index = int(index)
-        assert index < 0 or index > 2, "Index out of bounds"
-        assert isinstance(Edge, other), "Trying to fit a non-Edge."
+        assert 0 < index <= 2, "Index out of bounds"
+        assert isinstance(other, Edge), "Trying to fit a non-Edge."
         if self.p[index-1] == other.p[0]:
             return (other, 1)
         if self.p[index-1] == other.p[1]:
@@ -1,19 +1,240 @@
-from src.slicer.model.vector import Vector, Normal
-from src.slicer.model.triangle import Triangle, find_interpolated_points_at_x, find_interpolated_points_at_y, find_interpolated_points_at_z
-from struct import unpack
+from src.slicer.model.vector import TOLERANCE
+from src.slicer.model.triangle import Triangle, FacetView, slice_facets
+from src.slicer.model.validation import validate_facets
+from src.slicer.model.topology import Topology, row_keys
+from src.slicer.model.stl import HEADER_SIZE, SNIFF_SIZE, read_binary, is_binary, map_binary, is_ascii, ascii_name, iter_ascii
+import numpy as np
+import os
+
+# Number of facets processed at a time when streaming over a model
+CHUNK_SIZE = 65536
+
+# Fill in normals of zero length with the cross product of the facet edges
+def facet_normals(facets, normals=None):
+    if normals is None:
+        d1 = facets[:, 1] - facets[:, 0]
+        d2 = facets[:, 2] - facets[:, 1]
+        return np.cross(d1, d2)
+
+    # Only the missing ones are calculated, so no temporaries the size of the model
+    normals = np.array(normals, dtype=np.float64).reshape(-1, 3)
+    missing = ~np.any(normals, axis=1)
+    if missing.any():
+        normals[missing] = facet_normals(facets[missing])
+    return normals
+
+# Affine matrix moving points by an (x, y, z) offset
+def translation_matrix(offset):
+    matrix = np.identity(4)
+    matrix[:3, 3] = offset
+    return matrix
+
+# Affine matrix scaling points about the origin, by one factor or one per axis
+def scale_matrix(factor):
+    matrix = np.identity(4)
+    matrix[:3, :3] *= np.broadcast_to(np.asarray(factor, dtype=np.float64), 3)
+    return matrix
+
+# Apply a 4x4 affine matrix to (N,3,3) facets, returns the facets and their new normals
+# Normals are flipped back outwards when the matrix mirrors the model
+def apply_matrix(facets, matrix):
+    facets = facets @ matrix[:3, :3].T + matrix[:3, 3]
+    normals = facet_normals(facets)
+
+    if np.linalg.det(matrix[:3, :3]) < 0:
+        normals = -normals
+
+    return facets, normals
+
+# Merge vertices that are within tolerance of each other
+# Coordinates are quantized to integer multiples of the tolerance and sorted
+# Returns an (M,3) array of unique vertices and an (N,3) array of face indices
+def weld_vertices(facets, tolerance=TOLERANCE):
+    points = np.asarray(facets, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+
+    keys = np.round(points / tolerance).astype(np.int64)
+
+    order = np.lexsort((keys[:, 2], keys[:, 1], keys[:, 0]))
+    sorted_keys = keys[order]
+    first = np.ones(len(points), dtype=bool)
+    first[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+
+    ids = np.empty(len(points), dtype=np.int64)
+    ids[order] = np.cumsum(first) - 1
+
+    vertices = points[order[first]]
+    return vertices, ids.reshape(-1, 3)
+
+# Simplify facets by clustering their vertices on a grid of cell sized cubes
+# Every cluster is replaced by the mean of its vertices, facets left with fewer than
+# three clusters are dropped, as are facets collapsed onto the same three clusters,
+# which come in opposite pairs where a thin part folds flat
+# Returns the (M,3,3) simplified facets and how far any vertex moved
+def cluster_vertices(facets, cell):
+    points = np.asarray(facets, dtype=np.float64).reshape(-1, 3)
+    if len(points) == 0:
+        return np.zeros((0, 3, 3)), 0.0
+
+    # Cells counted from the lowest corner, so keys are small and never negative
+    lowest = np.array([points[:, k].min() for k in range(3)])
+    keys = np.floor((points - lowest) / cell).astype(np.int64)
+    _, ids = np.unique(row_keys(keys, int(keys.max()) + 1), return_inverse=True)
+    ids = ids.ravel()
+    count = int(ids.max()) + 1
+
+    sizes = np.bincount(ids, minlength=count)
+    centers = np.stack([np.bincount(ids, points[:, k], minlength=count) for k in range(3)], axis=1)
+    centers /= sizes[:, None]
+    offsets = centers[ids] - points
+    moved = float(np.sqrt(np.max(np.einsum('ij,ij->i', offsets, offsets))))
+
+    faces = ids.reshape(-1, 3)
+    kept = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces = faces[kept]
+
+    corners = row_keys(np.sort(faces, axis=1), count)
+    _, inverse, repeats = np.unique(corners, return_inverse=True, return_counts=True)
+    faces = faces[repeats[inverse.ravel()] == 1]
+
+    return centers[faces], moved
+
+# Pack every row of an (M,K) array into one opaque value, rows compare equal when
+# their values do, negative and positive zero counting as the same
+def packed_rows(rows):
+    rows = np.ascontiguousarray(rows)
+    if rows.dtype.kind == 'f':
+        rows = rows + 0.0
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
+# Count the unique rows over a stream of (M,K) arrays
+# Each chunk is cut down to its own unique rows and those are merged once at the end,
+# so the work grows with the rows streamed rather than with the chunks squared
+def count_unique(chunks):
+    uniques = [np.unique(packed_rows(chunk)) for chunk in chunks]
+    if len(uniques) == 0:
+        return 0
+    return len(np.unique(np.concatenate(uniques)))
+
+# Lazy sequence of Triangle objects over the facet arrays of a model
+# Each triangle is a FacetView into the model arrays, built when accessed
+# Memory mapped models are read chunk by chunk, so iterating streams over the file
+class TriangleView(object):
+
+    def __init__(self, model):
+        self.model = model
+        self.clear()
+
+    def __len__(self):
+        return len(self.model)
+
+    def __iter__(self):
+        if not self.model.memory_mapped:
+            for i in range(len(self)):
+                yield FacetView(self.points, self.model.normals, i)
+            return
+
+        for facets, normals in self.model.chunks():
+            points = facets.reshape(-1, 3)
+            for i in range(len(facets)):
+                yield FacetView(points, normals, i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Triangle index out of range")
+
+        if self.model.memory_mapped:
+            facets, normals = self.model.read_facets(index, index + 1)
+            return FacetView(facets.reshape(-1, 3), normals, 0)
+
+        return FacetView(self.points, self.model.normals, index)
+
+    # Refresh the flat point view after the model arrays change
+    def clear(self):
+        self.points = None
+        if not self.model.memory_mapped:
+            self.points = self.model.facets.reshape(-1, 3)
 
 # Class to represent 3D objects
+# Facets are stored in an (N,3,3) vertex array and an (N,3) normal array
+# When memory mapped from a path, both are zero-copy views over the file
+# and a pending affine matrix is applied as the facets are streamed in chunks
 class Model(object):
 
     # Initialize the object
-    def __init__(self, f=None):
+    def __init__(self, f=None, path=None, memory_map=False):
 
-        if f is None:
+        if f is None and path is None:
             raise ValueError("You must provide a file.")
 
-        self.triangles = []
-        self.vertices = {}
-        self.normals = {}
+        self.reset()
+
+        if f is None:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+
+            if memory_map and is_binary(header, os.path.getsize(path)):
+                self.process_map(path)
+                return
+
+            f = open(path, 'rb')
+
+        head = f.read(SNIFF_SIZE)
+
+        if is_ascii(head):
+            self.process_text(f, head)
+        else:
+            # File is a binary STL file.
+            self.process_bin(head + f.read())
+        f.close()
+
+    # Create a model straight from facet arrays, e.g. ones loaded from a cache
+    # vertices and faces are the indexed mesh of the facets if already known, and
+    # extents the (lower, upper, total) from extent_sums() to skip recomputing them
+    @classmethod
+    def from_arrays(cls, facets, normals, name=b"Unkown", vertices=None, faces=None,
+                    tolerance=TOLERANCE, extents=None):
+        model = cls.__new__(cls)
+        model.reset()
+
+        model.name = name
+        model.facets = facets
+        model.normals = normals
+        model.vertices = vertices
+        model.faces = faces
+        model.weld_tolerance = tolerance
+        model.triangles.clear()
+
+        if extents is None:
+            model.update_extents()
+        else:
+            model.set_extents(*extents)
+
+        return model
+
+    # Empty the model
+    def reset(self):
+        self.facets = np.zeros((0, 3, 3))
+        self.normals = np.zeros((0, 3))
+        self.memory_mapped = False
+        self.matrix = np.identity(4)
+        self.triangles = TriangleView(self)
+
+        # Arrays the facets are a view into while add_triangle has room left in them
+        self.spare = (None, None)
+
+        # Indexed mesh, filled in by weld()
+        self.vertices = None
+        self.faces = None
+        self.weld_tolerance = TOLERANCE
+        self.adjacency = None
 
         self.name = ""
 
@@ -23,55 +244,161 @@ class Model(object):
 
         self.mx = self.my = self.mz = 0.0
 
-        contents = f.read()
-        f.close()
-
-        if contents.find(b"vertex", 80) == -1:
-            # File is a binary STL file.
-            self.process_bin(contents)
-        else:
-            self.process_text(contents)
-
     def __str__(self):
         return "3D Model: %s" % self.name
 
     def __len__(self):
-        return len(self.triangles)
+        return len(self.facets)
 
     def __iter__(self):
         for t in self.triangles:
             yield t
 
+    # Get the facets and normals in [start, stop) as float arrays
+    # For memory mapped models, the pending matrix is applied to the copy
+    def read_facets(self, start, stop):
+        return self.take(slice(start, stop))
+
+    # Get the facets and normals at an index array or slice, see read_facets
+    def take(self, indices):
+        facets = np.asarray(self.facets[indices], dtype=np.float64)
+        normals = self.normals[indices]
+
+        if not self.memory_mapped:
+            return facets, normals
+
+        if np.array_equal(self.matrix, np.identity(4)):
+            return facets, facet_normals(facets, normals)
+        return apply_matrix(facets, self.matrix)
+
+    # Stream over the model facets, yields (facets, normals) chunks
+    def chunks(self, size=CHUNK_SIZE):
+        for start in range(0, len(self), size):
+            yield self.read_facets(start, start + size)
+
+    # Replace the facet arrays of the model and refresh everything derived from them
+    # Normals of zero length are recalculated from the facet vertices
+    def set_facets(self, facets, normals=None):
+        facets = np.ascontiguousarray(facets, dtype=np.float64).reshape(-1, 3, 3)
+
+        self.facets = facets
+        self.normals = np.ascontiguousarray(facet_normals(facets, normals))
+        self.memory_mapped = False
+        self.matrix = np.identity(4)
+        self.vertices = self.faces = self.adjacency = None
+        self.triangles.clear()
+        self.update_extents()
+
+    # Set the affine matrix applied when streaming a memory mapped model
+    def set_matrix(self, matrix):
+        if not self.memory_mapped:
+            raise ValueError("Only memory mapped models have a pending matrix.")
+
+        self.matrix = np.asarray(matrix, dtype=np.float64)
+        self.vertices = self.faces = self.adjacency = None
+        self.update_extents()
+
+    # Apply a 4x4 affine matrix to every vertex of the model at once
+    # Normals are recalculated and the extents and mean point updated
+    def transform(self, matrix):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.shape != (4, 4):
+            raise ValueError("Transform must be a 4x4 matrix.")
+
+        if self.memory_mapped:
+            self.set_matrix(matrix @ self.matrix)
+        else:
+            self.set_facets(*apply_matrix(self.facets, matrix))
+
+    # Move the model by an (x, y, z) offset
+    def translate(self, offset):
+        self.transform(translation_matrix(offset))
+
+    # Scale the model about the origin, by one factor or one per axis
+    def scale(self, factor):
+        self.transform(scale_matrix(factor))
+
+    # Check the facets for problems in one vectorized pass, see validate_facets
+    # With repair=True the degenerate, zero area and duplicate facets are dropped
+    # This reads and welds the whole model in memory, memory mapped models included
+    def validate(self, repair=True):
+        facets, normals = self.read_facets(0, len(self))
+        _, faces = self.weld()
+
+        report = validate_facets(facets, faces, self.weld_tolerance)
+        if repair and not report.ok():
+            report.removed = int(np.count_nonzero(~report.keep))
+            self.set_facets(facets[report.keep], normals[report.keep])
+
+        return report
+
+    # Build the indexed mesh of the model, unique vertices and face indices
+    def weld(self, tolerance=TOLERANCE):
+        if self.vertices is None or self.weld_tolerance != tolerance:
+            facets, _ = self.read_facets(0, len(self))
+            self.vertices, self.faces = weld_vertices(facets, tolerance)
+            self.weld_tolerance = tolerance
+            self.adjacency = None
+
+        return self.vertices, self.faces
+
+    # Number of vertices weld() would leave, counted chunk by chunk from the quantized
+    # coordinates when the model is not welded yet, so nothing is read whole
+    def count_vertices(self, tolerance=TOLERANCE):
+        if self.vertices is not None and self.weld_tolerance == tolerance:
+            return len(self.vertices)
+
+        return count_unique(np.round(facets.reshape(-1, 3) / tolerance).astype(np.int64)
+                            for facets, _ in self.chunks())
+
+    # Make a simplified copy of the model by clustering its vertices on a cell sized grid
+    # Returns the new model and how far any vertex moved, see cluster_vertices
+    def decimate(self, cell):
+        facets, _ = self.read_facets(0, len(self))
+        facets, moved = cluster_vertices(facets, cell)
+        return Model.from_arrays(facets, facet_normals(facets), name=self.name), moved
+
+    # Build the edge adjacency index of the welded mesh, see Topology
+    def topology(self):
+        vertices, faces = self.weld(self.weld_tolerance)
+        if self.adjacency is None:
+            self.adjacency = Topology(faces, len(vertices))
+
+        return self.adjacency
+
     # Add the specified vertices and possibly a normal vector to the obj
+    # Facets go into spare room at the end of the arrays, which double when full, so
+    # adding one is constant time and only the new facet's extents are folded in
     def add_triangle(self, v1, v2, v3, norm):
-        hash_1 = v1.hash
-        if hash_1 not in self.vertices:
-            self.vertices[hash_1] = v1
-
-        hash_2 = v2.hash
-        if hash_2 not in self.vertices:
-            self.vertices[hash_2] = v2
-
-        hash_3 = v3.hash
-        if hash_3 not in self.vertices:
-            self.vertices[hash_3] = v3
-
-        triangle = Triangle(self.vertices[hash_1], 
-                            self.vertices[hash_2], 
-                            self.vertices[hash_3],
-                            norm)
-
-        if not isinstance(norm, Normal):
-            norm = triangle.norm
-
-        normal_hash = norm.hash
-        if normal_hash not in self.normals:
-            self.normals[normal_hash] = norm
+        if self.memory_mapped:
+            raise ValueError("Triangles cannot be added to a memory mapped model.")
+
+        triangle = Triangle(v1, v2, v3, norm)
+        norm = triangle.norm
+        facet = np.array([[[v.x, v.y, v.z] for v in triangle.vertices]])
+        normal = facet_normals(facet, np.array([[norm.dx, norm.dy, norm.dz]]))
+
+        # Start new arrays when the current ones have no room to grow into
+        count = len(self)
+        if self.spare[0] is None or self.facets.base is not self.spare[0] or count == len(self.spare[0]):
+            self.spare = (np.empty((max(16, 2 * count), 3, 3)), np.empty((max(16, 2 * count), 3)))
+            self.spare[0][:count] = self.facets
+            self.spare[1][:count] = self.normals
+
+        self.spare[0][count] = facet[0]
+        self.spare[1][count] = normal[0]
+        self.facets = self.spare[0][:count + 1]
+        self.normals = self.spare[1][:count + 1]
+        self.vertices = self.faces = self.adjacency = None
+        self.triangles.clear()
+
+        points = facet[0]
+        lower, upper, total = self.extent_sums()
+        if lower is None:
+            self.set_extents(points.min(axis=0), points.max(axis=0), points.sum(axis=0))
         else:
-            triangle.norm = self.normals[normal_hash]
-
-        self.triangles.append(triangle)
-        self.update_extents(triangle)
+            self.set_extents(np.minimum(lower, points.min(axis=0)), np.maximum(upper, points.max(axis=0)),
+                             np.add(total, points.sum(axis=0)))
 
     def extents(self):
         return ((self.xmin, self.xmax),
@@ -84,52 +411,55 @@ class Model(object):
                 (self.zmin+self.zmax)/2)
 
     def mean_point(self):
-        c = 3 * len(self.triangles)
+        c = 3 * len(self.facets)
         return (self.mx/c, self.my/c, self.mz/c)
 
-    # Update the extents of the model based on Triangle t
-    def update_extents(self, triangle):
-        if self.xmin == None:
-            self.xmin = self.xmax = triangle.vertices[0].x
-            self.ymin = self.ymax = triangle.vertices[0].y
-            self.zmin = self.zmax = triangle.vertices[0].z
-
-            self.mx = 0.0
-            self.my = 0.0
-            self.mz = 0.0
-
-        self.mx += (triangle.vertices[0].x +
-                    triangle.vertices[1].x +
-                    triangle.vertices[2].x)
-        self.my += (triangle.vertices[0].y +
-                    triangle.vertices[1].y +
-                    triangle.vertices[2].y)
-        self.mz += (triangle.vertices[0].z +
-                    triangle.vertices[1].z +
-                    triangle.vertices[2].z)
-
-        for vertex in triangle.vertices:
-            if vertex.x < self.xmin:
-                self.xmin = vertex.x
-            elif vertex.x > self.xmax:
-                self.xmax = vertex.x
-
-            if vertex.y < self.ymin:
-                self.ymin = vertex.y
-            elif vertex.y > self.ymax:
-                self.ymax = vertex.y
-
-            if vertex.z < self.zmin:
-                self.zmin = vertex.z
-            elif vertex.z > self.zmax:
-                self.zmax = vertex.z
+    # Update the extents and mean point sums of the model chunk by chunk
+    def update_extents(self):
+        if len(self) == 0:
+            self.set_extents(None, None, None)
+            return
+
+        lower = np.full(3, np.inf)
+        upper = np.full(3, -np.inf)
+        total = np.zeros(3)
+
+        for facets, _ in self.chunks():
+            points = facets.reshape(-1, 3)
+            lower = np.minimum(lower, points.min(axis=0))
+            upper = np.maximum(upper, points.max(axis=0))
+            total += points.sum(axis=0)
+
+        self.set_extents(lower, upper, total)
+
+    # Set the extents from the lower and upper corners and the sum of all vertices
+    def set_extents(self, lower, upper, total):
+        if lower is None:
+            self.xmin = self.xmax = None
+            self.ymin = self.ymax = None
+            self.zmin = self.zmax = None
+            self.mx = self.my = self.mz = 0.0
+            return
+
+        self.xmin, self.ymin, self.zmin = (float(v) for v in lower)
+        self.xmax, self.ymax, self.zmax = (float(v) for v in upper)
+        self.mx, self.my, self.mz = (float(v) for v in total)
+
+    # The lower and upper corners and the sum of all vertices, see set_extents
+    def extent_sums(self):
+        if self.xmin is None:
+            return None, None, None
+
+        return ((self.xmin, self.ymin, self.zmin),
+                (self.xmax, self.ymax, self.zmax),
+                (self.mx, self.my, self.mz))
 
     def stats(self):
         out = {
             'name': self.name,
-            'facets': len(self.triangles),
-            'vertices': len(self.vertices),
-            'normals': len(self.normals),
+            'facets': len(self.facets),
+            'vertices': self.count_vertices(),
+            'normals': count_unique(normals for _, normals in self.chunks()),
             'extents': {
                 'x': {
                     'lower': self.xmin,
@@ -150,102 +480,69 @@ class Model(object):
 
         return out
 
+    # Read all facets of a binary STL file at once into the model arrays
     def process_bin(self, contents=None):
-        self.name, num_facets_1 = unpack(b"=80sI", contents[:84])
-
-        self.name = self.name.replace(b"solid", b"")
-        self.name = self.name.strip(b'\x00 \t\n\r')
-
-        if len(self.name) == 0:
-            self.name = b"Unkown"
-
-        contents = contents[84:]
-        facetsz = len(contents)
-
-        num_facets_2 = facetsz / 50
-
-        if num_facets_1 != num_facets_2:
-            raise ValueError("Incorrect number of facets.")
-
-        items = [contents[n:n+50] for n in range(0, facetsz, 50)]
-
-        for i in items:
-            nx, ny, nz, f1x, f1y, f1z, f2x, f2y, f2z, f3x, f3y, f3z = \
-                unpack(b"=ffffffffffffxx", i)
-            v1 = Vector(f1x, f1y, f1z)
-            v2 = Vector(f2x, f2y, f2z)
-            v3 = Vector(f3x, f3y, f3z)
-            try:
-                norm = Normal(nx, ny, nz)
-            except ValueError:
-                norm = None
-            
-            self.add_triangle(v1, v2, v3, norm)
-
-    # Process the contents of a text file as a generator
-    def process_text(self, contents=None):
-        items = contents.split()
-        del contents
-        items = [s.strip() for s in items]
-        try:
-            sn = items.index("solid")+1
-            en = items.index("facet")
-        except:
+        self.name, facets, normals = read_binary(contents)
+        self.set_facets(facets, normals)
+
+    # Memory map a binary STL file, the facets are read from disk as they are used
+    def process_map(self, path):
+        self.name, records = map_binary(path)
+
+        self.facets = records['vertices']
+        self.normals = records['normal']
+        self.memory_mapped = True
+        self.vertices = self.faces = self.adjacency = None
+        self.triangles.clear()
+        self.update_extents()
+
+    # Stream an ASCII STL file into the model arrays, batch by batch
+    # Batches are written into arrays that double in place when full and are trimmed at
+    # the end, so no batch is kept once written and the mesh is never copied whole
+    def process_text(self, f, head=b""):
+        self.name = ascii_name(head)
+
+        facets = np.empty((CHUNK_SIZE, 3, 3))
+        normals = np.empty((CHUNK_SIZE, 3))
+        count = 0
+        batches = 0
+        for batch_facets, batch_normals in iter_ascii(f, head):
+            if count + len(batch_facets) > len(facets):
+                size = max(2 * len(facets), count + len(batch_facets))
+                facets.resize((size, 3, 3), refcheck=False)
+                normals.resize((size, 3), refcheck=False)
+
+            facets[count:count + len(batch_facets)] = batch_facets
+            normals[count:count + len(batch_facets)] = batch_normals
+            count += len(batch_facets)
+            batches += 1
+
+        if batches == 0:
             raise ValueError("Not an STL file.")
-        if sn == en:
-            self.name = "unknown"
-        else:
-            self.name = ' '.join(items[sn:en])
-        nf1 = items.count('facet')
-        del items[0:en]
-        # Items now begins with "facet"
-        while items[0] == "facet":
-            v1 = Vector(items[8], items[9], items[10])
-            v2 = Vector(items[12], items[13], items[14])
-            v3 = Vector(items[16], items[17], items[18])
-            try:
-                norm = Normal(items[2], items[3], items[4])
-            except ValueError:
-                norm = None
-            
-            self.add_triangle(v1, v2, v3, norm)
-            del items[:21]
 
-# Function to slice the model at a certain z coordinate
-# Returns an array of tuples describing lines between points
-def slice_at_z(targetz, triangles):
-    output = []
+        facets.resize((count, 3, 3), refcheck=False)
+        normals.resize((count, 3), refcheck=False)
+        self.set_facets(facets, normals)
 
-    for triangle in triangles:
-        points = find_interpolated_points_at_z(targetz, triangle.vertices)
+# Function to slice triangles at a certain coordinate along an axis
+# Returns an array of tuples describing lines between points
+def slice_at(target, triangles, axis):
+    facets = [[v.tuplefy() for v in triangle.vertices] for triangle in triangles]
+    segments, _ = slice_facets(facets, axis, target)
 
-        if len(points) == 2:
-            output.append((points[0], points[1]))
+    return [(tuple(a), tuple(b)) for a, b in segments]
 
-    return output
+# Function to slice the model at a certain z coordinate
+# Returns an array of tuples describing lines between points
+def slice_at_z(targetz, triangles):
+    return slice_at(targetz, triangles, 'z')
 
 # Function to slice the model at a certain x coordinate
 # Returns an array of tuples describing lines between points
 def slice_at_x(targetx, triangles):
-    output = []
-
-    for triangle in triangles:
-        points = find_interpolated_points_at_x(targetx, triangle.vertices)
-
-        if len(points) == 2:
-            output.append((points[0], points[1]))
-
-    return output
+    return slice_at(targetx, triangles, 'x')
 
 # Function to slice the model at a certain y coordinate
 # Returns an array of tuples describing lines between points
 def slice_at_y(targety, triangles):
-    output = []
-
-    for triangle in triangles:
-        points = find_interpolated_points_at_y(targety, triangle.vertices)
-
-        if len(points) == 2:
-            output.append((points[0], points[1]))
-
-    return output
+    return slice_at(targety, triangles, 'y')
@@ -0,0 +1,133 @@
+import numpy as np
+import re
+
+# Layout of the fixed size header at the start of a binary STL file
+HEADER_SIZE = 84
+
+# Number of bytes looked at to tell ASCII and binary STL files apart
+SNIFF_SIZE = 4096
+
+# Number of bytes read at a time when streaming an ASCII STL file
+BLOCK_SIZE = 1 << 20
+
+# Matches the three coordinates after each normal or vertex keyword
+COORDS = re.compile(rb'(?:normal|vertex)\s+(\S+)\s+(\S+)\s+(\S+)')
+
+# Matches the name on the first line of an ASCII STL file
+SOLID = re.compile(rb'\s*solid[ \t]*([^\r\n]*)')
+
+# Layout of a single 50 byte facet record in a binary STL file
+FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute', '<u2'),
+])
+
+# Clean up the 80 byte header of a binary STL file into a model name
+def parse_name(header):
+    name = header.replace(b"solid", b"")
+    name = name.strip(b'\x00 \t\n\r')
+
+    if len(name) == 0:
+        name = b"Unkown"
+
+    return name
+
+# Read the header of a binary STL file, returns the name and facet count
+def read_header(contents):
+    if len(contents) < HEADER_SIZE:
+        raise ValueError("Not an STL file.")
+
+    num_facets = int(np.frombuffer(contents, dtype='<u4', count=1, offset=80)[0])
+    return parse_name(bytes(contents[:80])), num_facets
+
+# Interpret the facet block of a binary STL file as a structured array
+# No data is copied, the result is a view over contents
+def facet_records(contents):
+    name, num_facets_1 = read_header(contents)
+
+    facetsz = len(contents) - HEADER_SIZE
+    num_facets_2 = facetsz / FACET_DTYPE.itemsize
+
+    if num_facets_1 != num_facets_2:
+        raise ValueError("Incorrect number of facets.")
+
+    records = np.frombuffer(contents, dtype=FACET_DTYPE, count=num_facets_1, offset=HEADER_SIZE)
+    return name, records
+
+# Read a whole binary STL file in one go
+# Returns the name, an (N,3,3) vertex array and an (N,3) normal array
+def read_binary(contents):
+    name, records = facet_records(contents)
+
+    facets = np.ascontiguousarray(records['vertices'], dtype=np.float64)
+    normals = np.ascontiguousarray(records['normal'], dtype=np.float64)
+
+    return name, facets, normals
+
+# Check from the file size whether a file with this header is a binary STL file
+def is_binary(header, size):
+    if len(header) < HEADER_SIZE:
+        return False
+
+    _, num_facets = read_header(header)
+    return HEADER_SIZE + num_facets * FACET_DTYPE.itemsize == size
+
+# Memory map the facet block of a binary STL file
+# Returns the name and a read only structured array backed by the file
+def map_binary(path):
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    name, num_facets = read_header(header)
+
+    if num_facets == 0:
+        return name, np.zeros(0, dtype=FACET_DTYPE)
+
+    records = np.memmap(path, dtype=FACET_DTYPE, mode='r', offset=HEADER_SIZE, shape=(num_facets,))
+    return name, records
+
+# Check from the first bytes of a file whether it is an ASCII STL file
+def is_ascii(head):
+    return head.find(b"vertex", 80) != -1
+
+# Parse the coordinates of complete facets into (N,3,3) vertex and (N,3) normal arrays
+def parse_facets(text):
+    coords = COORDS.findall(text)
+    if len(coords) % 4 != 0:
+        raise ValueError("Incomplete facet in STL file.")
+
+    values = np.array(coords, dtype=np.float64).reshape(-1, 4, 3)
+    return values[:, 1:], values[:, 0]
+
+# Get the name from the first line of an ASCII STL file
+def ascii_name(head):
+    match = SOLID.match(head)
+    if match is None:
+        raise ValueError("Not an STL file.")
+
+    name = match.group(1).strip()
+    if len(name) == 0:
+        name = b"unknown"
+
+    return name
+
+# Read an ASCII STL file incrementally, starting with the bytes in head
+# Yields (facets, normals) batches holding at most about one block of text
+# Every block is only scanned once, so parsing is linear in the file size
+def iter_ascii(f, head=b"", block_size=BLOCK_SIZE):
+    buffer = head
+
+    while True:
+        block = f.read(block_size)
+
+        # Only parse up to the last complete facet, keep the rest for later
+        end = buffer.rfind(b"endfacet") if block else len(buffer)
+        if end > 0:
+            facets, normals = parse_facets(buffer[:end])
+            if len(facets) > 0:
+                yield facets, normals
+            buffer = buffer[end:]
+
+        if not block:
+            break
+        buffer += block
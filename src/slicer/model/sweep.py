@@ -0,0 +1,104 @@
+from src.slicer.model.triangle import AXES, PLANE_COORDS, plane_pairs, slice_facets
+import numpy as np
+
+# Interval index from slice planes to the facets that reach them
+# Every facet is bucketed into the run of planes between its lowest and highest
+# point along the axis, so a layer only ever looks at the facets it can cross
+class SweepIndex(object):
+
+    def __init__(self, model, axis, planes):
+        self.model = model
+        self.axis = AXES.get(axis, axis)
+        self.planes = np.asarray(planes, dtype=np.float64)
+
+        # Planes may come in any order, buckets are found over the sorted ones
+        order = np.argsort(self.planes, kind='stable')
+
+        # Lowest and highest point of each facet, streamed chunk by chunk
+        lower = []
+        upper = []
+        for facets, _ in model.chunks():
+            along = facets[:, :, self.axis]
+            lower.append(along.min(axis=1))
+            upper.append(along.max(axis=1))
+        lower = np.concatenate(lower) if lower else np.zeros(0)
+        upper = np.concatenate(upper) if upper else np.zeros(0)
+
+        # Group the (plane, facet) pairs by the caller's plane order
+        plane_ids, facet_ids = plane_pairs(lower, upper, self.planes[order])
+        plane_ids = order[plane_ids]
+        grouping = np.argsort(plane_ids, kind='stable')
+        self.facet_ids = facet_ids[grouping]
+        self.offsets = np.zeros(len(self.planes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(plane_ids, minlength=len(self.planes)), out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.planes)
+
+    # Indices of the facets reaching plane j
+    def facets(self, j):
+        return self.facet_ids[self.offsets[j]:self.offsets[j + 1]]
+
+    # Total number of (plane, facet) pairs, the work a sweep has to do
+    def size(self):
+        return len(self.facet_ids)
+
+# Slice a whole model at a stack of planes along an axis, chunk by chunk
+# Returns (M,2,2) segments grouped by plane and offsets so that
+# segments[offsets[j]:offsets[j+1]] are the segments of plane j
+def slice_model(model, axis, planes):
+    planes = np.asarray(planes, dtype=np.float64)
+
+    segments = []
+    plane_ids = []
+    for facets, _ in model.chunks():
+        chunk_segments, chunk_planes = slice_facets(facets, axis, planes)
+        segments.append(chunk_segments)
+        plane_ids.append(chunk_planes)
+
+    segments = np.concatenate(segments) if segments else np.zeros((0, 2, 2))
+    plane_ids = np.concatenate(plane_ids) if plane_ids else np.zeros(0, dtype=np.int64)
+
+    grouping = np.argsort(plane_ids, kind='stable')
+    offsets = np.zeros(len(planes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(plane_ids, minlength=len(planes)), out=offsets[1:])
+
+    return segments[grouping], offsets
+
+# Find the planes that cut a model in the same cross-section
+# Between two neighbouring vertex heights the same facets are crossed by the same
+# sides, and a facet standing parallel to the axis is cut along the same line by every
+# plane, so where only such facets span the gap all planes in it cut the same loops
+# Planes through a vertex height always get their own section
+# Returns for every plane the index of the first plane cutting the same section
+def layer_sources(model, axis, planes):
+    axis = AXES.get(axis, axis)
+    u, v = PLANE_COORDS[axis]
+    planes = np.asarray(planes, dtype=np.float64)
+
+    # Every vertex height, gap g running from levels[g] to levels[g + 1]
+    levels = [np.unique(facets[:, :, axis]) for facets, _ in model.chunks()]
+    levels = np.unique(np.concatenate(levels)) if levels else np.zeros(0)
+
+    # Count the slanted facets spanning every gap
+    spans = np.zeros(len(levels) + 1, dtype=np.int64)
+    for facets, _ in model.chunks():
+        d1 = facets[:, 1] - facets[:, 0]
+        d2 = facets[:, 2] - facets[:, 0]
+        slanted = d1[:, u] * d2[:, v] != d1[:, v] * d2[:, u]
+        along = facets[slanted][:, :, axis]
+        spans += np.bincount(np.searchsorted(levels, along.min(axis=1)), minlength=len(spans))
+        spans -= np.bincount(np.searchsorted(levels, along.max(axis=1)), minlength=len(spans))
+    moving = np.cumsum(spans) > 0
+
+    # Gap of every plane, -1 below the model and len(levels) - 1 above it
+    gaps = np.searchsorted(levels, planes, side='right') - 1
+    inside = (gaps >= 0) & (gaps < len(levels) - 1)
+    on_level = np.zeros(len(planes), dtype=bool)
+    on_level[gaps >= 0] = levels[gaps[gaps >= 0]] == planes[gaps >= 0]
+    changing = on_level | (inside & moving[np.maximum(gaps, 0)])
+
+    # Planes sharing a gap share a section, the rest are keyed by their own index
+    keys = np.where(changing, len(levels) + 1 + np.arange(len(planes)), gaps + 1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first[inverse.ravel()]
@@ -0,0 +1,83 @@
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+import numpy as np
+
+# Pack each row of vertex indices into one int64 so rows can be compared with 1D sorts
+# Falls back to a structured view when the indices are too large to pack
+def row_keys(rows, count):
+    rows = np.ascontiguousarray(rows, dtype=np.int64)
+    if count ** rows.shape[1] < 2 ** 63:
+        keys = np.zeros(len(rows), dtype=np.int64)
+        for column in range(rows.shape[1]):
+            keys = keys * count + rows[:, column]
+        return keys
+
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
+# Find the unique edges of (N,3) faces
+# Side k of a face runs from corner k to corner (k+1)%3
+# Returns (E,2) sorted vertex pairs and the (N,3) edge id of every side
+def edge_index(faces, count=None):
+    faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+    if count is None:
+        count = int(faces.max()) + 1 if len(faces) > 0 else 0
+
+    sides = np.stack((faces, np.roll(faces, -1, axis=1)), axis=-1).reshape(-1, 2)
+    sides = np.sort(sides, axis=1)
+
+    _, first, ids = np.unique(row_keys(sides, count), return_index=True, return_inverse=True)
+    return sides[first], ids.reshape(-1, 3)
+
+# Edge adjacency index of an indexed mesh
+# edge_faces lists the faces of every edge, edge_offsets[e]:edge_offsets[e+1] being edge e
+# neighbors[f, k] is the face across side k of face f, -1 if that edge is not shared by exactly two
+class Topology(object):
+
+    def __init__(self, faces, count=None):
+        self.faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        self.edges, self.face_edges = edge_index(self.faces, count)
+
+        # Sides sorted by edge, as flat 3 * face + side positions
+        flat = self.face_edges.ravel()
+        self.sides = np.argsort(flat, kind='stable')
+        self.edge_faces = self.sides // 3
+
+        self.edge_counts = np.bincount(flat, minlength=len(self.edges))
+        self.edge_offsets = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        np.cumsum(self.edge_counts, out=self.edge_offsets[1:])
+
+        self.neighbors = np.full(self.faces.shape, -1, dtype=np.int64)
+        start = self.edge_offsets[:-1][self.edge_counts == 2]
+        a = self.sides[start]
+        b = self.sides[start + 1]
+        self.neighbors.ravel()[a] = b // 3
+        self.neighbors.ravel()[b] = a // 3
+
+    def __len__(self):
+        return len(self.faces)
+
+    # Faces using edge e
+    def faces_of_edge(self, e):
+        return self.edge_faces[self.edge_offsets[e]:self.edge_offsets[e + 1]]
+
+    # (M,2) vertex pairs of the edges used by more than two faces
+    def non_manifold_edges(self):
+        return self.edges[self.edge_counts > 2]
+
+    # (M,2) vertex pairs of the edges used by only one face
+    def open_edges(self):
+        return self.edges[self.edge_counts == 1]
+
+    # Whether every edge is shared by exactly two faces
+    def manifold(self):
+        return bool(np.all(self.edge_counts == 2))
+
+    # Label the faces by connected part, faces sharing any edge are connected
+    # Returns the number of parts and an (N,) array of part labels
+    def components(self):
+        same = self.face_edges.ravel()[self.sides[1:]] == self.face_edges.ravel()[self.sides[:-1]]
+        a = self.edge_faces[:-1][same]
+        b = self.edge_faces[1:][same]
+
+        graph = coo_matrix((np.ones(len(a), dtype=np.int8), (a, b)), shape=(len(self), len(self)))
+        return connected_components(graph, directed=False)
@@ -1,9 +1,10 @@
-from src.slicer.model.vector import Vector, Normal
+from src.slicer.model.vector import Vector, Normal, VectorView, NormalView
 from src.slicer.model.edge import Edge
-from numba import njit
+import numpy as np
 
 # Class to represent a triangle in 3D Space
 class Triangle(object):
+    __slots__ = ('vertices', 'norm')
 
     def __init__(self, p1, p2, p3, norm):
 
@@ -33,107 +34,124 @@ class Triangle(object):
     def __str__(self):
         return 'Triangle: %s, %s, %s' % (self.vertices[0], self.vertices[1], self.vertices[2])
 
-# Find the vector between the 2 points
-@njit(fastmath=True)
-def findInterpolatedPoint(A, B, targetz):
-    # Find the vector between the two...
-    V = (B[0] - A[0], B[1] - A[1], B[2] - A[2])
-    
-    # Therefore the interpolated point = ('n' * V) + A
-    refz = targetz - A[2]
-    n = refz / V[2]
-    coords = (n * V[0] + A[0], n * V[1] + A[1])
-    return coords
+# Read only Triangle over one facet of shared (M,3) point and (N,3) normal arrays
+# The vertices and normal are views built when accessed, nothing is copied
+# vertices is a tuple, so writing to it fails instead of changing a throwaway copy,
+# move a model with Model.transform instead
+class FacetView(Triangle):
+    __slots__ = ('points', 'normals', 'index')
+
+    def __init__(self, points, normals, index):
+        self.points = points
+        self.normals = normals
+        self.index = index
+
+    @property
+    def vertices(self):
+        i = 3 * self.index
+        return (VectorView(self.points, i),
+                VectorView(self.points, i + 1),
+                VectorView(self.points, i + 2))
+
+    @property
+    def norm(self):
+        return NormalView(self.normals, self.index)
+
+# Index of the coordinate each slicing direction cuts along
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+# The two coordinates kept in the slice plane for each axis, x gives (y, z),
+# y gives (x, z) and z gives (x, y)
+PLANE_COORDS = {0: (1, 2), 1: (0, 2), 2: (0, 1)}
+
+# Pair every facet with each plane between its lowest and highest point
+# lower and upper hold the (N,) facet bounds along the axis, planes must be sorted
+# Returns the (P,) plane and facet index of every pair, grouped by plane
+def plane_pairs(lower, upper, planes):
+    first = np.searchsorted(planes, lower, side='left')
+    last = np.searchsorted(planes, upper, side='right') - 1
+
+    counts = np.maximum(last - first + 1, 0)
+    facet_ids = np.repeat(np.arange(len(counts)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    plane_ids = np.repeat(first, counts) + np.arange(len(facet_ids)) - starts
+
+    grouping = np.argsort(plane_ids, kind='stable')
+    return plane_ids[grouping], facet_ids[grouping]
+
+# Intersect (N,3,3) facets with a stack of planes across one axis in one batch
+# A vertex lying on a plane counts as above it, so facets touching a plane at a
+# corner give nothing and every crossed mesh edge is crossed by all its facets
+# Segments run with the solid on their left in the plane coordinates, so outer
+# loops go counter clockwise and holes clockwise
+# Returns (M,2,2) segments in the plane coordinates and the (M,) plane index of each
+# With return_sides=True, also the (M,) facet index and (M,2) facet side of each end,
+# side k being the edge from corner k to corner (k+1)%3
+def slice_facets(facets, axis, planes, return_sides=False):
+    axis = AXES.get(axis, axis)
+    facets = np.asarray(facets, dtype=np.float64).reshape(-1, 3, 3)
+    planes = np.atleast_1d(np.asarray(planes, dtype=np.float64))
+
+    # Candidate (plane, facet) pairs over the sorted planes
+    order = np.argsort(planes, kind='stable')
+    along = facets[:, :, axis]
+    plane_ids, facet_ids = plane_pairs(along.min(axis=1), along.max(axis=1), planes[order])
+    plane_ids = order[plane_ids]
+
+    # Height of every corner above its plane
+    height = along[facet_ids] - planes[plane_ids][:, None]
+    above = height >= 0
+    crossing = above.any(axis=1) & ~above.all(axis=1)
+
+    plane_ids = plane_ids[crossing]
+    facet_ids = facet_ids[crossing]
+    height = height[crossing]
+    above = above[crossing]
+    corners = facets[facet_ids]
+
+    # Exactly two sides change between below and above, in side order
+    cut = above != np.roll(above, -1, axis=1)
+    sides = np.argsort(~cut, axis=1, kind='stable')[:, :2]
+
+    rows = np.arange(len(sides))[:, None]
+    start = sides
+    end = (sides + 1) % 3
+    h0 = height[rows, start]
+    h1 = height[rows, end]
+    t = (h0 / (h0 - h1))[:, :, None]
+    points = corners[rows, start] + t * (corners[rows, end] - corners[rows, start])
+
+    u, v = PLANE_COORDS[axis]
+    segments = points[:, :, [u, v]]
+
+    # Orient each segment so the facet normal points to its right
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    travel = np.stack((-normals[:, v], normals[:, u]), axis=1)
+    flip = np.einsum('ij,ij->i', segments[:, 1] - segments[:, 0], travel) < 0
+    segments[flip] = segments[flip][:, ::-1]
+    sides[flip] = sides[flip][:, ::-1]
+
+    if return_sides:
+        return segments, plane_ids, facet_ids, sides
+    return segments, plane_ids
+
+# Find the two points where a triangle crosses the plane at target along axis
+def find_interpolated_points(target, vertices, axis):
+    facet = [[v.x, v.y, v.z] for v in vertices]
+    segments, _ = slice_facets(facet, axis, target)
+
+    if len(segments) == 0:
+        return []
+    return [tuple(point) for point in segments[0]]
 
 # Find interpolated points along the z axis at a specified z coordinate
 def find_interpolated_points_at_z(targetz, vertices):
-    pair = []
-
-    # Calculate the coordinates of one segment at z = targetz (between v[0] and v[1])
-    if (vertices[0].z > targetz and vertices[1].z < targetz) or (vertices[0].z < targetz and vertices[1].z > targetz):
-        A = (vertices[0].x, vertices[0].y, vertices[0].z)
-        B = (vertices[1].x, vertices[1].y, vertices[1].z)
-        pair.append(findInterpolatedPoint(A, B, targetz))
-
-    # Calculate the coordinates of one segment at z = targetz (between v[0] and v[2])
-    if (vertices[0].z > targetz and vertices[2].z < targetz) or (vertices[0].z < targetz and vertices[2].z > targetz):
-        A = (vertices[0].x, vertices[0].y, vertices[0].z)
-        B = (vertices[2].x, vertices[2].y, vertices[2].z)
-        pair.append(findInterpolatedPoint(A, B, targetz))
-
-    # Calculate the coordinates of one segment at z = targetz (between v[1] and v[2])
-    if (vertices[1].z > targetz and vertices[2].z < targetz) or (vertices[1].z < targetz and vertices[2].z > targetz):
-        A = (vertices[1].x, vertices[1].y, vertices[1].z)
-        B = (vertices[2].x, vertices[2].y, vertices[2].z)
-        pair.append(findInterpolatedPoint(A, B, targetz))
-
-    if vertices[0].z == targetz:
-        pair.append((vertices[0].x, vertices[0].y))
-    elif vertices[1].z == targetz:
-        pair.append((vertices[1].x, vertices[1].y))
-    elif vertices[2].z == targetz:
-        pair.append((vertices[2].x, vertices[2].y))
-
-    return pair
+    return find_interpolated_points(targetz, vertices, 'z')
 
 # Find interpolated points along the x axis at a specified x coordinate
 def find_interpolated_points_at_x(targetx, vertices):
-    pair = []
-
-    # Calculate the coordinates of one segment at x = targetx (between v[0] and v[1])
-    if (vertices[0].x > targetx and vertices[1].x < targetx) or (vertices[0].x < targetx and vertices[1].x > targetx):
-        A = (vertices[0].y, vertices[0].z, vertices[0].x)
-        B = (vertices[1].y, vertices[1].z, vertices[1].x)
-        pair.append(findInterpolatedPoint(A, B, targetx))
-
-    # Calculate the coordinates of one segment at x = targetx (between v[0] and v[2])
-    if (vertices[0].x > targetx and vertices[2].x < targetx) or (vertices[0].x < targetx and vertices[2].x > targetx):
-        A = (vertices[0].y, vertices[0].z, vertices[0].x)
-        B = (vertices[2].y, vertices[2].z, vertices[2].x)
-        pair.append(findInterpolatedPoint(A, B, targetx))
-
-    # Calculate the coordinates of one segment at x = targetx (between v[1] and v[2])
-    if (vertices[1].x > targetx and vertices[2].x < targetx) or (vertices[1].x < targetx and vertices[2].x > targetx):
-        A = (vertices[1].y, vertices[1].z, vertices[1].x)
-        B = (vertices[2].y, vertices[2].z, vertices[2].x)
-        pair.append(findInterpolatedPoint(A, B, targetx))
-
-    if vertices[0].x == targetx:
-        pair.append((vertices[0].y, vertices[0].z))
-    elif vertices[1].x == targetx:
-        pair.append((vertices[1].y, vertices[1].z))
-    elif vertices[2].x == targetx:
-        pair.append((vertices[2].y, vertices[2].z))
-
-    return pair
+    return find_interpolated_points(targetx, vertices, 'x')
 
 # Find interpolated points along the y axis at a specified y coordinate
 def find_interpolated_points_at_y(targety, vertices):
-    pair = []
-
-    # Calculate the coordinates of one segment at y = targety (between v[0] and v[1])
-    if (vertices[0].y > targety and vertices[1].y < targety) or (vertices[0].y < targety and vertices[1].y > targety):
-        A = (vertices[0].x, vertices[0].z, vertices[0].y)
-        B = (vertices[1].x, vertices[1].z, vertices[1].y)
-        pair.append(findInterpolatedPoint(A, B, targety))
-
-    # Calculate the coordinates of one segment at y = targety (between v[0] and v[2])
-    if (vertices[0].y > targety and vertices[2].y < targety) or (vertices[0].y < targety and vertices[2].y > targety):
-        A = (vertices[0].x, vertices[0].z, vertices[0].y)
-        B = (vertices[2].x, vertices[2].z, vertices[2].y)
-        pair.append(findInterpolatedPoint(A, B, targety))
-
-    # Calculate the coordinates of one segment at y = targety (between v[1] and v[2])
-    if (vertices[1].y > targety and vertices[2].y < targety) or (vertices[1].y < targety and vertices[2].y > targety):
-        A = (vertices[1].x, vertices[1].z, vertices[1].y)
-        B = (vertices[2].x, vertices[2].z, vertices[2].y)
-        pair.append(findInterpolatedPoint(A, B, targety))
-
-    if vertices[0].y == targety:
-        pair.append((vertices[0].x, vertices[0].z))
-    elif vertices[1].y == targety:
-        pair.append((vertices[1].x, vertices[1].z))
-    elif vertices[2].y == targety:
-        pair.append((vertices[2].x, vertices[2].z))
-
-    return pair
+    return find_interpolated_points(targety, vertices, 'y')
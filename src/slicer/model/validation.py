@@ -0,0 +1,66 @@
+from src.slicer.model.vector import TOLERANCE
+from src.slicer.model.topology import row_keys, edge_index
+import numpy as np
+
+# Result of checking the facets of a model
+# Each flag array holds one bool per facet, keep marks the facets worth keeping
+class ValidationReport(object):
+
+    def __init__(self, degenerate, zero_area, duplicate, non_manifold_edges, open_edges):
+        self.degenerate = degenerate
+        self.zero_area = zero_area
+        self.duplicate = duplicate
+        self.non_manifold_edges = non_manifold_edges
+        self.open_edges = open_edges
+        self.keep = ~(degenerate | zero_area | duplicate)
+        self.removed = 0
+
+    def __str__(self):
+        s = ('Validation: {} facets, {} degenerate, {} zero area, {} duplicate, '
+             '{} non-manifold edges, {} open edges, {} removed')
+        return s.format(len(self.keep), int(self.degenerate.sum()), int(self.zero_area.sum()),
+                        int(self.duplicate.sum()), len(self.non_manifold_edges),
+                        len(self.open_edges), self.removed)
+
+    # Whether nothing was found that needs dropping
+    def ok(self):
+        return bool(self.keep.all())
+
+    # Whether every edge is shared by exactly two facets
+    def manifold(self):
+        return len(self.non_manifold_edges) == 0 and len(self.open_edges) == 0
+
+# Check (N,3,3) facets and their (N,3) face indices into welded vertices in one pass
+# Flags facets with coincident points, no area or the same corners as an earlier facet,
+# and lists the edges used by more than two facets or by only one
+def validate_facets(facets, faces, tolerance=TOLERANCE):
+    facets = np.asarray(facets, dtype=np.float64)
+    faces = np.asarray(faces)
+
+    # Two corners welded into the same vertex
+    degenerate = ((faces[:, 0] == faces[:, 1]) |
+                  (faces[:, 1] == faces[:, 2]) |
+                  (faces[:, 0] == faces[:, 2]))
+
+    # Colinear corners, the area is tiny compared to the longest edge
+    d1 = facets[:, 1] - facets[:, 0]
+    d2 = facets[:, 2] - facets[:, 0]
+    d3 = facets[:, 2] - facets[:, 1]
+    area = np.linalg.norm(np.cross(d1, d2), axis=1)
+    longest = np.max([np.einsum('ij,ij->i', d, d) for d in (d1, d2, d3)], axis=0)
+    zero_area = ~degenerate & (area <= tolerance * longest)
+
+    # Same three vertices as an earlier facet, in any order
+    count = int(faces.max()) + 1 if len(faces) > 0 else 0
+    corners = np.sort(faces, axis=1)
+    _, first = np.unique(row_keys(corners, count), return_index=True)
+    duplicate = np.ones(len(faces), dtype=bool)
+    duplicate[first] = False
+    duplicate &= ~(degenerate | zero_area)
+
+    # Edges of the remaining facets and how many facets use each one
+    edges, ids = edge_index(faces[~(degenerate | zero_area | duplicate)], count)
+    counts = np.bincount(ids.ravel(), minlength=len(edges))
+
+    return ValidationReport(degenerate, zero_area, duplicate,
+                            edges[counts > 2], edges[counts == 1])
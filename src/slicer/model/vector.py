@@ -5,15 +5,21 @@ TOLERANCE = 1e-7
 
 # Class for a 3D Catesian Point
 class Vector(object):
+    __slots__ = ('x', 'y', 'z')
+
     # Creates a 3D vector from coords
     def __init__(self, x, y, z):
         self.x = float(x)
         self.y = float(y)
         self.z = float(z)
 
+    # MD5 digest of the coordinates, only computed when asked for
+    # Models dedupe vertices with weld_vertices instead of these
+    @property
+    def hash(self):
         key_string = '(%f, %f, %f)' % (self.x, self.y, self.z)
         key_string = key_string.encode('utf-8')
-        self.hash = md5(key_string).hexdigest()
+        return md5(key_string).hexdigest()
 
     def __add__(self, other):
         return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
@@ -37,6 +43,10 @@ class Vector(object):
     def __mul__(self, multi):
         return Vector(self.x * multi, self.y * multi, self.z * multi)
     
+    # Coordinates quantized to multiples of TOLERANCE, equal for welded vertices
+    def key(self):
+        return (round(self.x / TOLERANCE), round(self.y / TOLERANCE), round(self.z / TOLERANCE))
+
     def tuplefy(self):
         return (self.x, self.y, self.z)
 
@@ -51,20 +61,59 @@ class Vector(object):
                         self.x*other.y-self.y*other.x)
 
 # Class for a 3D normal vector in catesian space
+# dx, dy and dz are the same values as x, y and z
 class Normal(Vector):
+    __slots__ = ()
 
     def __init__(self, dx, dy, dz):
-        self.dx = float(dx)
-        self.dy = float(dy)
-        self.dz = float(dz)
-
-        l = sqrt(self.dx*self.dx+self.dy*self.dy+self.dz*self.dz)
+        super(Normal, self).__init__(dx, dy, dz)
 
-        if l == 0.0:
+        if self.length() == 0.0:
             raise ValueError("Length of Vector is 0")
 
-        super(Normal, self).__init__(self.dx, self.dy, self.dz)
+    @property
+    def dx(self):
+        return self.x
+
+    @property
+    def dy(self):
+        return self.y
+
+    @property
+    def dz(self):
+        return self.z
 
     def __str__(self):
         return 'Normal: (%f, %f, %f)' % (self.dx, self.dy, self.dz)
 
+# Read only Vector over one row of an (M,3) array, no coordinates are copied
+class VectorView(Vector):
+    __slots__ = ('array', 'index')
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    @property
+    def x(self):
+        return float(self.array[self.index, 0])
+
+    @property
+    def y(self):
+        return float(self.array[self.index, 1])
+
+    @property
+    def z(self):
+        return float(self.array[self.index, 2])
+
+# Read only Normal over one row of an (M,3) array, no coordinates are copied
+class NormalView(Normal):
+    __slots__ = ('array', 'index')
+
+    def __init__(self, array, index):
+        self.array = array
+        self.index = index
+
+    x = VectorView.x
+    y = VectorView.y
+    z = VectorView.z
@@ -0,0 +1,163 @@
+import os, sys, time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+from src.slicer.model.model import Model
+from src.slicer.model.sweep import slice_model
+from src.slicer.engine import slice_loops
+from src.slicer.contour import assemble_contours
+
+# Cut the model at planes and link every layer into Contours
+# backend 'python' batches the cut in numpy, 'numba' runs it in compiled code
+def cut_layers(model, axis, planes, backend='python'):
+    if backend == 'numba':
+        return slice_loops(model, axis, planes)
+
+    segments, offsets = slice_model(model, axis, planes)
+    return [assemble_contours(segments[offsets[j]:offsets[j + 1]]) for j in range(len(planes))]
+
+# Mesh arrays of a model copied into shared memory blocks for worker processes
+# Workers map the blocks back in by name, nothing is pickled but the names
+class SharedMesh(object):
+
+    def __init__(self, model):
+        self.blocks = []
+        self.specs = {}
+
+        # Copied chunk by chunk so memory mapped models get their matrix applied
+        facets = self.share('facets', (len(model), 3, 3), np.float64)
+        normals = self.share('normals', (len(model), 3), np.float64)
+        start = 0
+        for chunk, chunk_normals in model.chunks():
+            facets[start:start + len(chunk)] = chunk
+            normals[start:start + len(chunk)] = chunk_normals
+            start += len(chunk)
+
+        # Share the indexed mesh too when there is one, so workers need not weld again
+        if model.vertices is not None:
+            self.share('vertices', model.vertices.shape, np.float64)[:] = model.vertices
+            self.share('faces', model.faces.shape, np.int64)[:] = model.faces
+
+        self.meta = {'name': model.name, 'tolerance': model.weld_tolerance,
+                     'extents': model.extent_sums()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Make a shared block for an array and return the array over it
+    def share(self, key, shape, dtype):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks.append(block)
+        self.specs[key] = (block.name, tuple(shape), dtype.str)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+# Map the blocks of a SharedMesh back into arrays, returns the blocks and the arrays
+def attach(specs):
+    blocks = []
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+# State of a worker process, set up once by start_worker
+worker = {}
+
+def start_worker(specs, meta, axis, backend, render, combine):
+    blocks, arrays = attach(specs)
+    worker['blocks'] = blocks
+    worker['model'] = Model.from_arrays(name=meta['name'], tolerance=meta['tolerance'],
+                                        extents=meta['extents'], **arrays)
+    worker['axis'] = axis
+    worker['backend'] = backend
+    worker['render'] = render
+    worker['combine'] = combine
+
+# Slice the run of layers from start at planes in a worker
+# Returns start, the result of every layer or, with combine, all of them folded into
+# one, the worker's pid and the seconds taken
+def slice_range(task):
+    start, planes = task
+    tic = time.time()
+
+    render = worker['render']
+    combine = worker['combine']
+    results = []
+    for j, contours in enumerate(cut_layers(worker['model'], worker['axis'], planes, worker['backend'])):
+        result = contours if render is None else render(start + j, contours)
+        if combine is not None and len(results) > 0:
+            results[0] = combine(results[0], result)
+        else:
+            results.append(result)
+
+    return start, results, os.getpid(), time.time() - tic
+
+# Slice a model at planes over a pool of worker processes
+# The mesh is shared with the workers, which each take runs of layers and cut, link and,
+# if given, render(j, contours) them, results come back in plane order
+# With combine(a, b) the results are instead folded into one as they come in, runs
+# being folded in the workers, so only one result per worker is ever held
+# workers=None uses every core, per-worker throughput is printed at the end
+# Workers start from a fork server, or are spawned where there is none, and import the
+# calling script again, so a script calling this keeps its work under
+# if __name__ == '__main__'
+def slice_parallel(model, axis, planes, workers=None, backend='python', render=None, combine=None,
+                   runs_per_worker=4):
+    planes = np.asarray(planes, dtype=np.float64)
+    workers = workers or os.cpu_count()
+
+    # Layer runs, more than workers so an uneven part still balances out
+    runs = [run for run in np.array_split(np.arange(len(planes)), workers * runs_per_worker) if len(run) > 0]
+    tasks = [(int(run[0]), planes[run[0]:run[-1] + 1]) for run in runs]
+    sizes = {int(run[0]): len(run) for run in runs}
+
+    # Workers start from a fresh server process rather than a fork of this one, a fork
+    # taken after the numba engine has started its threads hangs the exit
+    # Where there is no fork server, as on Windows, they are spawned instead
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+    layers = [None] * len(planes)
+    folded = None
+    done = 0
+    throughput = {}
+    with SharedMesh(model) as mesh:
+        with context.Pool(workers, initializer=start_worker,
+                          initargs=(mesh.specs, mesh.meta, axis, backend, render, combine)) as pool:
+            for start, results, pid, seconds in pool.imap_unordered(slice_range, tasks):
+                if combine is None:
+                    layers[start:start + len(results)] = results
+                else:
+                    folded = results[0] if folded is None else combine(folded, results[0])
+
+                count, total = throughput.get(pid, (0, 0.0))
+                throughput[pid] = (count + sizes[start], total + seconds)
+
+                # Draw the percentage done
+                done += sizes[start]
+                sys.stdout.write("\r%d%%" % int(done / len(planes) * 100))
+                sys.stdout.flush()
+
+            # Let the workers exit on their own so what they set up is cleaned up
+            pool.close()
+            pool.join()
+
+    print()
+    for pid, (count, total) in sorted(throughput.items()):
+        print("Status: Worker %d sliced %d layers in %.2fs (%.1f layers/s)"
+              % (pid, count, total, count / total if total > 0 else 0.0))
+
+    return layers if combine is None else folded
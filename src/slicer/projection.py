@@ -0,0 +1,110 @@
+from src.slicer.model.triangle import AXES, PLANE_COORDS
+from numba import njit
+import numpy as np
+
+# Orthographic depth projection of a model
+# Every triangle is drawn once into a near and a far depth buffer, which stand in for
+# slicing the model into layers when only the nearest or furthest layer is wanted
+
+# Draw (N,3,2) triangles in pixel coordinates with (N,3) depths into near and far,
+# keeping the smallest and largest depth that covers every pixel center
+# facing is below 0 for triangles a ray going up the axis enters the model through and
+# above 0 for those it leaves through, enter keeps the largest depth a ray enters at
+# and leave the smallest it leaves at, the ends of the last and first solid spans
+@njit(cache=True)
+def draw_depths(triangles, depths, facing, near, far, enter, leave):
+    height, width = near.shape
+    for t in range(len(triangles)):
+        x0, y0 = triangles[t, 0, 0], triangles[t, 0, 1]
+        x1, y1 = triangles[t, 1, 0], triangles[t, 1, 1]
+        x2, y2 = triangles[t, 2, 0], triangles[t, 2, 1]
+
+        area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+        if area == 0.0:
+            continue
+
+        # Pixels whose center can be inside the triangle
+        left = max(int(np.ceil(min(x0, x1, x2) - 0.5)), 0)
+        right = min(int(np.floor(max(x0, x1, x2) - 0.5)), width - 1)
+        top = max(int(np.ceil(min(y0, y1, y2) - 0.5)), 0)
+        bottom = min(int(np.floor(max(y0, y1, y2) - 0.5)), height - 1)
+
+        for row in range(top, bottom + 1):
+            y = row + 0.5
+            for column in range(left, right + 1):
+                x = column + 0.5
+
+                # Barycentric weights, all of one sign inside the triangle
+                w0 = ((x1 - x) * (y2 - y) - (x2 - x) * (y1 - y)) / area
+                w1 = ((x2 - x) * (y0 - y) - (x0 - x) * (y2 - y)) / area
+                w2 = 1.0 - w0 - w1
+                if w0 < 0.0 or w1 < 0.0 or w2 < 0.0:
+                    continue
+
+                depth = w0 * depths[t, 0] + w1 * depths[t, 1] + w2 * depths[t, 2]
+                if depth < near[row, column]:
+                    near[row, column] = depth
+                if depth > far[row, column]:
+                    far[row, column] = depth
+                if facing[t] < 0.0 and depth > enter[row, column]:
+                    enter[row, column] = depth
+                if facing[t] > 0.0 and depth < leave[row, column]:
+                    leave[row, column] = depth
+
+# Project a model along axis into depth buffers of shape, in model units
+# to_pixels maps (N,2) plane coordinates to pixel coordinates
+# Returns near, far, enter and leave as draw_depths fills them, pixels the model does
+# not cover are left at +inf in near and leave and -inf in far and enter
+# The facet winding decides which way a triangle faces, so a mesh wound the wrong way
+# leaves enter at -inf and leave at +inf, which only lose the gap test of top_layers
+def project_depths(model, axis, shape, to_pixels):
+    axis = AXES.get(axis, axis)
+    u, v = PLANE_COORDS[axis]
+
+    near = np.full(shape, np.inf)
+    far = np.full(shape, -np.inf)
+    enter = np.full(shape, -np.inf)
+    leave = np.full(shape, np.inf)
+    for facets, _ in model.chunks():
+        triangles = to_pixels(facets[:, :, [u, v]].reshape(-1, 2)).reshape(-1, 3, 2)
+
+        # Component of the facet normal along the axis, u and v are swapped for y
+        d1 = facets[:, 1] - facets[:, 0]
+        d2 = facets[:, 2] - facets[:, 0]
+        facing = d1[:, u] * d2[:, v] - d1[:, v] * d2[:, u]
+        if axis == 1:
+            facing = -facing
+
+        draw_depths(np.ascontiguousarray(triangles), np.ascontiguousarray(facets[:, :, axis]),
+                    np.ascontiguousarray(facing), near, far, enter, leave)
+
+    return near, far, enter, leave
+
+# Turn depth buffers into the layer index that slicing at planes would leave on top
+# Layers stack from the first plane to the last, or the other way when reverse is set,
+# so the top layer is the last plane inside the model along each pixel's ray
+# That plane is only known to be inside when it falls in the last solid span along the
+# ray, from enter to far, or the first one from near to leave when reversed, on a
+# concave part it can fall in an empty gap between spans and some earlier plane is on top
+# Returns an int array of layer indices in stacking order, -1 where no layer is drawn,
+# and a bool array of the pixels whose top plane falls in a gap, left at -1
+def top_layers(near, far, planes, reverse=False, enter=None, leave=None):
+    planes = np.asarray(planes)
+    count = len(planes)
+
+    if reverse:
+        index = np.searchsorted(planes, near, side='left')
+        inside = index < count
+        plane = planes[np.minimum(index, count - 1)]
+        inside &= plane <= far
+        gaps = inside & (plane > leave) if leave is not None else np.zeros_like(inside)
+        layer = count - 1 - index
+    else:
+        index = np.searchsorted(planes, far, side='right') - 1
+        inside = index >= 0
+        plane = planes[np.maximum(index, 0)]
+        inside &= plane >= near
+        gaps = inside & (plane < enter) if enter is not None else np.zeros_like(inside)
+        layer = index
+
+    return np.where(inside & ~gaps, layer, -1), gaps
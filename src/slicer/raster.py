@@ -0,0 +1,83 @@
+from numba import njit
+import numpy as np
+
+# Scanline rasterizer for the loops of a layer
+# A pixel is filled when its center is inside the loops, so all the loops of a layer
+# are filled in one pass and holes come out empty without drawing them again
+
+# Fill the loops stored back to back in points, offsets[i]:offsets[i+1] being loop i,
+# into an (H,W) uint8 mask, x running along columns and y along rows
+# Each loop is closed back to its first point, with nonzero the winding of the
+# loops decides what is inside, otherwise crossing an edge flips inside and out
+@njit(cache=True)
+def fill_loops(points, offsets, mask, value, nonzero):
+    height, width = mask.shape
+
+    # Count the edge crossings of every row center, rows being bucketed by count
+    counts = np.zeros(height + 1, dtype=np.int64)
+    for i in range(len(offsets) - 1):
+        start = offsets[i]
+        stop = offsets[i + 1]
+        for k in range(start, stop):
+            y0 = points[k, 1]
+            y1 = points[start + (k + 1 - start) % (stop - start), 1]
+            lower = max(int(np.ceil(min(y0, y1) - 0.5)), 0)
+            upper = min(int(np.ceil(max(y0, y1) - 0.5)), height)
+            if upper > lower:
+                counts[lower + 1:upper + 1] += 1
+
+    for row in range(height):
+        counts[row + 1] += counts[row]
+
+    # Where every row crosses the edges and which way the edge goes
+    crossings = np.empty(counts[height])
+    windings = np.empty(counts[height], dtype=np.int64)
+    filled = counts[:height].copy()
+    for i in range(len(offsets) - 1):
+        start = offsets[i]
+        stop = offsets[i + 1]
+        for k in range(start, stop):
+            x0 = points[k, 0]
+            y0 = points[k, 1]
+            j = start + (k + 1 - start) % (stop - start)
+            x1 = points[j, 0]
+            y1 = points[j, 1]
+            lower = max(int(np.ceil(min(y0, y1) - 0.5)), 0)
+            upper = min(int(np.ceil(max(y0, y1) - 0.5)), height)
+            for row in range(lower, upper):
+                center = row + 0.5
+                crossings[filled[row]] = x0 + (center - y0) * (x1 - x0) / (y1 - y0)
+                windings[filled[row]] = 1 if y1 > y0 else -1
+                filled[row] += 1
+
+    # Fill the pixel centers between crossings along every row
+    for row in range(height):
+        start = counts[row]
+        stop = counts[row + 1]
+        order = np.argsort(crossings[start:stop]) + start
+        winding = 0
+        for n in range(len(order) - 1):
+            if nonzero:
+                winding += windings[order[n]]
+                inside = winding != 0
+            else:
+                inside = n % 2 == 0
+            if not inside:
+                continue
+
+            first = max(int(np.ceil(crossings[order[n]] - 0.5)), 0)
+            last = min(int(np.ceil(crossings[order[n + 1]] - 0.5)), width)
+            for column in range(first, last):
+                mask[row, column] = value
+
+# Fill loops given in pixel coordinates into a uint8 mask
+# rule is 'evenodd' or 'nonzero', mask is made of shape when not given and is
+# written in place otherwise, value is what filled pixels are set to
+def rasterize(points, offsets, shape=None, mask=None, value=255, rule='evenodd'):
+    if mask is None:
+        mask = np.zeros(shape, dtype=np.uint8)
+
+    points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    fill_loops(points, offsets, mask, value, rule == 'nonzero')
+    return mask
@@ -1,12 +1,17 @@
-import sys, os, time
+import sys, os, io, time, functools
 from typing import final
 sys.path.append(os.getcwd())
 
-from src.slicer.model.model import Model, slice_at_x, slice_at_y, slice_at_z
-from src.slicer.model.vector import Vector, Normal
-from PIL import Image, ImageDraw, ImageOps
-from sklearn.neighbors import KDTree
-from shapely.geometry import Polygon, Point
+from src.slicer.model.model import Model, translation_matrix, scale_matrix
+from src.slicer.model.sweep import layer_sources
+from src.slicer.parallel import cut_layers, slice_parallel
+from src.slicer.raster import rasterize
+from src.slicer.contour import Contours
+from src.slicer.projection import project_depths, top_layers
+from src.slicer.elevation import ElevationMasks
+from src.slicer.metadata import image_metadata, save_metadata, load_metadata
+from src.slicer.cache import MeshCache, file_digest, content_digest
+from PIL import Image, ImageDraw
 import numpy as np
 
 # Determine how much space a pixel takes up physically
@@ -19,7 +24,8 @@ def mmToinch(num):
 def inchTomm(num):
     return num*25.4
 
-def convertToPixels(vSet, width_multiplier, height_multiplier, object_center, center_image):
+# Convert an (N,2) array of points in inches to an array of pixel coordinates
+def pointsToPixels(vSet, width_multiplier, height_multiplier, object_center, center_image):
     mmSet = inchTomm(np.asarray(vSet))
     # Convert to pixels
     mmSet[:,0]*=width_multiplier
@@ -30,49 +36,166 @@ def convertToPixels(vSet, width_multiplier, height_multiplier, object_center, ce
     mmSet[:,0]-=(inchTomm(object_center[0])*width_multiplier)
     mmSet[:,1]+=(center_image[1])
     mmSet[:,1]-=(inchTomm(object_center[1])*height_multiplier)
+    return mmSet
 
+def convertToPixels(vSet, width_multiplier, height_multiplier, object_center, center_image):
+    mmSet = pointsToPixels(vSet, width_multiplier, height_multiplier, object_center, center_image)
     m = list(mmSet)
     for i in range(len(mmSet)):
         m[i]= tuple(m[i])
     return m
 
-def parse_file(f=None, scale_model=None):
+# Load a model and move it to the origin, scaled by scale_model
+# With memory_map=True a binary STL at path is mapped instead of read, and
+# the move and scale are applied as the facets are streamed
+# With validate=True, broken facets are found and dropped before scaling
+# Validating reads and welds the whole model in memory, so validate=None validates
+# only models that are not memory mapped, a mapped model is streamed as it is
+# With a MeshCache, models already processed are loaded from it instead
+def parse_file(f=None, scale_model=None, path=None, memory_map=False, cache=None, validate=None):
     print("Status: Loading File.")
 
-    model = Model(f)
-    stats = model.stats()
+    if validate is None:
+        validate = not memory_map
 
-    # Note these are in inches not mm
-    sub_vertex = Vector(stats['extents']['x']['lower'], stats['extents']['y']['lower'], stats['extents']['z']['lower'])
+    if cache is not None:
+        if f is not None:
+            contents = f.read()
+            f.close()
+            digest = content_digest(contents)
+            f = io.BytesIO(contents)
+        else:
+            digest = file_digest(path)
 
-    model.xmin = model.xmax = None
-    model.ymin = model.ymax = None
-    model.zmin = model.zmax = None
+        key = cache.key(digest, scale_model=scale_model, validate=validate)
+        model = cache.load(key)
+        if model is not None:
+            print("Status: Loaded From Cache.")
+            return model
 
-    print("Status: Scaling Triangles.")
+    model = Model(f, path=path, memory_map=memory_map)
 
-    for triangle in model.triangles:
-        triangle.vertices[0] -= sub_vertex
-        triangle.vertices[1] -= sub_vertex
-        triangle.vertices[2] -= sub_vertex
+    if validate:
+        print("Status: Validating Facets.")
+        print(model.validate())
+    (xmin, _), (ymin, _), (zmin, _) = model.extents()
 
-        # The lines above have no effect on the normal.
+    print("Status: Scaling Triangles.")
 
-        triangle.vertices[0] = (triangle.vertices[0] * scale_model)  # in inches
-        triangle.vertices[1] = (triangle.vertices[1] * scale_model)  # in inches
-        triangle.vertices[2] = (triangle.vertices[2] * scale_model)  # in inches
+    # Move the model to the origin and scale it in one pass, in inches
+    model.transform(scale_matrix(scale_model) @ translation_matrix((-xmin, -ymin, -zmin)))
 
-        # Recalculate the triangle normal
+    if cache is not None:
+        cache.store(key, model)
 
-        u = model.triangles[0].vertices[1] - model.triangles[0].vertices[0]
-        v = model.triangles[0].vertices[2] - model.triangles[0].vertices[0]
+    return model
 
-        triangle.n = Normal((u.y * v.z) - (u.z * v.y), (u.z * v.x) - (u.x * v.z), (u.x * v.y) - (u.y * v.x))
-        model.update_extents(triangle)
+# Fill the Contours of a layer into a (width_px, height_px) uint8 array set to value
+# All loops are filled in one even-odd pass, so holes stay empty and islands inside
+# holes are filled again
+def layer_mask(vertice_sets, width_px, height_px, width_multiplier, height_multiplier, obj_center_xyz, center_image, value=1):
+    layer = np.zeros((width_px, height_px), dtype=np.uint8)
+    if len(vertice_sets) > 0:
+        points = pointsToPixels(vertice_sets.points, width_multiplier, height_multiplier, obj_center_xyz, center_image)
+        rasterize(points, vertice_sets.offsets, mask=layer, value=value)
+
+    return layer
+
+# Draw the Contours of layer slice_idx in its gray
+def draw_layer(slice_idx, vertice_sets, colors, width_px, height_px, width_multiplier, height_multiplier, obj_center_xyz, center_image):
+    return layer_mask(vertice_sets, width_px, height_px, width_multiplier, height_multiplier,
+                      obj_center_xyz, center_image, colors[slice_idx])
+
+# Positions of the slice planes along direction, resolution mm apart, in inches
+def slice_positions(model, direction, resolution):
+    upper = model.extents()['xyz'.index(direction)][1]
+    return np.linspace(0.001, upper - 0.001, int(upper / (mmToinch(resolution))) + 1)
+
+# Gray of every layer in the order they are stacked, each a step lighter than the last
+def layer_colors(count):
+    grayIncrement = float(255 / count)
+
+    colors = []
+    colorVal = 0
+    for slice_idx in range(count):
+        colorVal = int(colorVal + grayIncrement)
+        colors.append(colorVal)
+    return colors
+
+# Center of the model's bounding box, in inches
+def model_center(model):
+    return [(lower + upper) / 2 for lower, upper in model.extents()]
+
+# Find the top layer of the pixels top_layers left in gaps by slicing after all
+# Only the planes from the lowest start to the highest end of the pixels' unknown runs,
+# lower to upper along the rays, are cut and drawn with mask, layer is filled in place
+# Returns how many planes were cut
+def fill_gaps(layer, gaps, lower, upper, slices, slice_reverse, model, direction, backend, mask):
+    candidates = np.flatnonzero((slices >= lower[gaps].min()) & (slices <= upper[gaps].max()))
+    layers = cut_layers(model, direction, slices[candidates], backend)
+
+    for plane_idx, vertice_sets in zip(candidates, layers):
+        stack_idx = len(slices) - 1 - plane_idx if slice_reverse else plane_idx
+        hit = gaps & (mask(vertice_sets) > 0)
+        layer[hit] = np.maximum(layer[hit], stack_idx)
+
+    return len(candidates)
+
+# Group the layers at slices that cut the model in the same section, see layer_sources
+# Returns the planes that need cutting, in the order of slices, and for every layer the
+# index of the plane it reuses, adaptive=False cutting every plane
+def layer_runs(model, direction, slices, adaptive=True):
+    if adaptive:
+        sources = layer_sources(model, direction, slices)
+    else:
+        sources = np.arange(len(slices))
+
+    distinct, inverse = np.unique(sources, return_inverse=True)
+    return slices[distinct], inverse.ravel()
+
+# Cluster the model's mesh on a grid for slicing, see Model.decimate
+# simplify True sizes the grid at half the smaller of a pixel and a layer so the image
+# barely changes, a number is the cell size in mm, anything false keeps the model
+def simplify_model(model, simplify, width_multiplier, height_multiplier, resolution):
+    if not simplify:
+        return model
+
+    cell = min(1 / width_multiplier, 1 / height_multiplier, resolution) / 2 if simplify is True else simplify
+    simple, moved = model.decimate(mmToinch(cell))
+    print("Status: Simplified %d to %d facets, vertices moved up to %.3f mm" % (len(model), len(simple), inchTomm(moved)))
+    return simple
+
+# Save a height buffer as the final image, mirrored for reversed slicing
+# The image's metadata, with any params given, is written next to it and returned
+def save_heights(heights, slice_reverse, output, pixel_mm=None, **params):
+    heights = heights[::-1]
+    if (slice_reverse):
+        heights = heights[:, ::-1]
 
-    return model
+    final_image = Image.fromarray(np.ascontiguousarray(heights), 'L').convert('RGBA')
+    final_image.save(output, 'PNG')
 
-def slice_file(resolution, model, direction='z', width_px=None, height_px=None, width_printer=None, height_printer=None, slice_reverse = False, output= ""):
+    record = image_metadata(heights, pixel_mm)
+    record.update(params)
+    save_metadata(output, record)
+    return record
+
+# Slice a model into layers along direction and composite them into one image
+# backend picks how layers are cut, 'python' batches it in numpy, 'numba' runs it
+# in parallel compiled code, both link the segments into Contours in linear time,
+# 'numba' reads the whole model into memory so it does not stream a mapped model
+# workers above 1 spreads the layers over that many processes, None uses every core
+# mode='depth' skips slicing and projects the triangles into a depth buffer instead,
+# then colors every pixel as the layer slicing would leave on top, only the pixels whose
+# top plane falls in a gap of a concave part are sliced, see fill_gaps
+# simplify clusters the mesh on a grid before slicing, see simplify_model
+# adaptive cuts and draws a run of layers with the same section only once, which gives
+# the same image as every layer is lighter than the ones below it, see layer_runs
+# Returns the metadata record of the image and the Contours of every layer in slicing
+# order, layers being None when they never reach this process, and the layers of a
+# run sharing the Contours of its first plane, the same outline with its points slid
+# along the walls
+def slice_file(resolution, model, direction='z', width_px=None, height_px=None, width_printer=None, height_printer=None, slice_reverse = False, output= "", backend='python', workers=1, mode='slices', simplify=None, adaptive=True):
 
     # Converstion from mm to pixels
     width_multiplier = calculateMultiplier(width_px, width_printer) 
@@ -83,138 +206,203 @@ def slice_file(resolution, model, direction='z', width_px=None, height_px=None,
 
     print("Status: Calculating Slices")
 
-    stats = model.stats()
-
-    # This is after scaling the object
-    sub_vertex = Vector(stats['extents']['x']['lower'], stats['extents']['y']['lower'],
-                        stats['extents']['z']['lower'])
-    sup_vertex = Vector(stats['extents']['x']['upper'], stats['extents']['y']['upper'],
-                        stats['extents']['z']['upper'])
-    obj_center_xyz = [(sup_vertex.x + sub_vertex.x) / 2, (sup_vertex.y + sub_vertex.y) / 2,
-                      (sup_vertex.z + sub_vertex.z) / 2]  # in inches
-
-    if direction == 'x':
-        slices = np.linspace(0.001, stats['extents']['x']['upper'] - 0.001,
-                              int(stats['extents']['x']['upper'] / (mmToinch(resolution))) + 1)
-    elif direction == 'y':
-        slices = np.linspace(0.001, stats['extents']['y']['upper'] - 0.001,
-                              int(stats['extents']['y']['upper'] / (mmToinch(resolution))) + 1)
-    elif direction == 'z':
-        slices = np.linspace(0.001, stats['extents']['z']['upper'] - 0.001,
-                              int(stats['extents']['z']['upper'] / (mmToinch(resolution))) + 1)
-
-    imgs = []
-    grayIncrement = float(255 / len(slices))
-    color = (0, 0, 0, 255)
+    # This is after scaling the object, only the extents are needed so the
+    # weld and normal counts of model.stats() are skipped
+    obj_center_xyz = model_center(model)  # in inches
+
+    slices = slice_positions(model, direction, resolution)
+    colors = layer_colors(len(slices))
 
     tic = time.time()
+
+    # Placed from the full model above, so simplifying does not move the image
+    model = simplify_model(model, simplify, width_multiplier, height_multiplier, resolution)
+
+    if mode == 'depth':
+        to_pixels = functools.partial(pointsToPixels, width_multiplier=width_multiplier, height_multiplier=height_multiplier,
+                                      object_center=obj_center_xyz, center_image=center_image)
+        near, far, enter, leave = project_depths(model, direction, (width_px, height_px), to_pixels)
+        layer, gaps = top_layers(near, far, slices, slice_reverse, enter, leave)
+
+        # Rays whose top plane falls between solid spans are sliced after all
+        if gaps.any():
+            lower, upper = (leave, far) if slice_reverse else (near, enter)
+            mask = functools.partial(layer_mask, width_px=width_px, height_px=height_px, width_multiplier=width_multiplier,
+                                     height_multiplier=height_multiplier, obj_center_xyz=obj_center_xyz, center_image=center_image)
+            cut = fill_gaps(layer, gaps, lower, upper, slices, slice_reverse, model, direction, backend, mask)
+            print("Status: Sliced %d layers for %d pixels in gaps" % (cut, np.count_nonzero(gaps)))
+        heights = np.where(layer >= 0, np.asarray(colors + [0], dtype=np.uint8)[layer], 0).astype(np.uint8)
+        record = save_heights(heights, slice_reverse, output, pixel_mm=(1 / width_multiplier, 1 / height_multiplier),
+                              direction=direction, resolution=resolution, layers=len(slices), reverse=bool(slice_reverse), mode=mode)
+
+        print("Status: Finished Projecting")
+        print('Time: ', time.time() - tic)
+        return record, None
     
     if (slice_reverse):
         slices = np.flip(slices)
 
-    for slice_idx, slice_val in enumerate(slices):
-        if direction == 'x':
-            pairs = slice_at_x(slice_val, model.triangles)
-        elif direction == 'y':
-            pairs = slice_at_y(slice_val, model.triangles)
-        elif direction == 'z':
-            pairs = slice_at_z(slice_val, model.triangles)
-
-        # Now process vertices
-        a = np.asarray(pairs)
-        b = a.flatten()
-
-        # Hacky Fix: This is now twice as long and just not four wide, it is now too wide
-        vert_array = b.reshape(int(b.shape[0] / 2), 2)  
-        tree = KDTree(vert_array, leaf_size=3)
-        current_index = 1
-        vertices = []
-        vertice_sets = []
-        visited_vertices = [current_index]
-        vertices.append(tuple(vert_array[current_index]))
-        for i in range(int(vert_array.shape[0] / 2)):
-            to_query = np.reshape(vert_array[current_index], (1, 2))
-            _, ind = tree.query(to_query, k=2)
-            for id in list(ind[0]):  # there should only be two
-                if id != current_index:
-                    # If loop is found,
-                    if id in visited_vertices:
-                        vertices.append(tuple(vert_array[id]))
-                        vertice_sets.append(vertices)
-                        vertices = []
-                        for next_vert in range(vert_array.shape[0]):
-                            if next_vert not in visited_vertices:
-                                current_index = next_vert
-                    # Now that it found the match, find the corresponding vertex,
-                    # Remember that they are in pairs of two
-                    elif id % 2 == 1:
-                        current_index = id - 1
-                        break
-                    else:
-                        current_index = id + 1
-                        break
-            visited_vertices.append(id)
-            vertices.append(tuple(vert_array[current_index]))
-            visited_vertices.append(current_index)
-
-        # Draw the percentage done
-        sys.stdout.write("\r%d%%" % int(slice_idx / len(slices) * 100))
-        sys.stdout.flush()
-
-        # Save the last one to the vertice set
-        vertice_sets.append(vertices)
-        img = Image.new('RGBA', (height_px, width_px))
-        imgDraw = ImageDraw.Draw(img)
-        holes = []
-        colorVal = int(color[0] + grayIncrement)
-        color = (colorVal, colorVal, colorVal, 255)
-
-        # Inside the for loop where polygons are drawn
-        for i in range(len(vertice_sets)):
-            if len(vertice_sets[i]) > 2:
-                set = convertToPixels(vertice_sets[i], width_multiplier, height_multiplier, obj_center_xyz, center_image)
-                
-                # Check if any other vertex is inside the polygon
-                # Check if any vertex of the current polygon is inside any other polygon
-                is_hole = False
-                for j in range(len(vertice_sets)):
-                    if j != i and len(vertice_sets[j]) > 2:
-                        other_set = convertToPixels(vertice_sets[j], width_multiplier, height_multiplier, obj_center_xyz, center_image)
-                        other_poly = Polygon(other_set)
-                        for vertex in set:
-                            if other_poly.contains(Point(vertex)):
-                                is_hole = True
-                                break
-                        if is_hole:
-                            break
-                
-                # Fill the polygon based on whether it's a hole or not
-                if is_hole:
-                    holes.append(set)
-                imgDraw.polygon(set, fill=color)
-
-        for set in holes:
-            imgDraw.polygon(set, fill=(0, 0, 0, 255))
-
-        data = img.getdata()
-
-        newData = []
-        for item in data:
-            if item[0] == 0 and item[1] == 0 and item[2] == 0:
-                newData.append((0, 0, 0, 0))
-            else:
-                newData.append(item)
-        
-        img.putdata(newData)
-        imgs.append(img)
-
-    final_image = Image.new('RGBA', (height_px, width_px), color=(0, 0, 0, 255))  
-    for img in imgs:
-        final_image.paste(img, (0, 0), img)  # Paste the current image onto the final image, using itself as the mask
+    # Only the top layer of a run shows, so each cut plane is drawn in its run's last gray
+    planes, runs = layer_runs(model, direction, slices, adaptive)
+    last = np.zeros(len(planes), dtype=np.int64)
+    np.maximum.at(last, runs, np.arange(len(slices)))
+    print("Status: Cutting %d of %d layers" % (len(planes), len(slices)))
+
+    render = functools.partial(draw_layer, colors=[colors[slice_idx] for slice_idx in last], width_px=width_px, height_px=height_px,
+                               width_multiplier=width_multiplier, height_multiplier=height_multiplier,
+                               obj_center_xyz=obj_center_xyz, center_image=center_image)
+
+    # Layers get lighter as they go, so keeping the lightest gray of every pixel
+    # is the same as stacking the layers in order
+    if workers == 1:
+        # Intersect the triangles with every layer in one batch,
+        # each layer only looks at the triangles spanning it
+        layers = cut_layers(model, direction, planes, backend)
+
+        heights = np.zeros((width_px, height_px), dtype=np.uint8)
+        for plane_idx, vertice_sets in enumerate(layers):
+            # Draw the percentage done
+            sys.stdout.write("\r%d%%" % int(plane_idx / len(planes) * 100))
+            sys.stdout.flush()
+
+            np.maximum(heights, render(plane_idx, vertice_sets), out=heights)
+
+        layers = [layers[plane_idx] for plane_idx in runs]
+    else:
+        # Cut and draw runs of layers in worker processes sharing the mesh
+        heights = slice_parallel(model, direction, planes, workers, backend, render, combine=np.maximum)
+        layers = None
+
+    record = save_heights(heights, slice_reverse, output, pixel_mm=(1 / width_multiplier, 1 / height_multiplier),
+                          direction=direction, resolution=resolution, layers=len(slices), reverse=bool(slice_reverse), mode=mode)
+
+    print("\nStatus: Finished Outputting Slices")
+    print('Time: ', time.time() - tic)
+    return record, layers
+
+# Slice a model into the loops of every layer without drawing or writing anything
+# Yields (slice_idx, position, contours) as each batch of layers is cut, position being
+# the plane in mm and contours the layer's Contours with their nesting already found
+# units='mm' gives the loops in mm on the model, units='px' in pixels on the image
+# slice_file would write, which needs the image and printer sizes
+def iter_contours(resolution, model, direction='z', units='mm', width_px=None, height_px=None, width_printer=None, height_printer=None, slice_reverse = False, backend='python', batch=64):
+    if units == 'px':
+        width_multiplier = calculateMultiplier(width_px, width_printer)
+        height_multiplier = calculateMultiplier(height_px, height_printer)
+        center_image = [int(width_px / 2), int(height_px / 2)]
+        obj_center_xyz = model_center(model)  # in inches
+
+    slices = slice_positions(model, direction, resolution)
     if (slice_reverse):
-        final_image = ImageOps.mirror(final_image)
-    final_image = ImageOps.flip(final_image)
-    final_image.save(output, 'PNG')
+        slices = np.flip(slices)
+
+    for start in range(0, len(slices), batch):
+        layers = cut_layers(model, direction, slices[start:start + batch], backend)
+        for slice_idx, vertice_sets in enumerate(layers, start):
+            if units == 'px':
+                points = pointsToPixels(vertice_sets.points, width_multiplier, height_multiplier, obj_center_xyz, center_image)
+
+                # Flipped and mirrored the way save_heights turns the image
+                points[:, 1] = width_px - points[:, 1]
+                if (slice_reverse):
+                    points[:, 0] = height_px - points[:, 0]
+            else:
+                points = inchTomm(vertice_sets.points)
+
+            contours = Contours(points, vertice_sets.offsets, vertice_sets.closed)
+            contours.nesting()
+            yield slice_idx, inchTomm(slices[slice_idx]), contours
+
+# List of the (slice_idx, position, contours) of every layer, see iter_contours
+def slice_contours(resolution, model, direction='z', units='mm', width_px=None, height_px=None, width_printer=None, height_printer=None, slice_reverse = False, backend='python'):
+    return list(iter_contours(resolution, model, direction, units, width_px, height_px, width_printer, height_printer,
+                              slice_reverse, backend))
+
+# Slice the STL file at path into output, or copy the result from a SliceCache when the
+# same file was already sliced with the same settings, skipping parsing and slicing
+# Returns the metadata record and layer Contours like slice_file, runs over several
+# workers are kept apart from serial ones as they come back without Contours
+def slice_cached(cache, path, scale_model, resolution, direction='z', width_px=None, height_px=None, width_printer=None, height_printer=None, slice_reverse = False, output= "", backend='python', workers=1, mode='slices', mesh_cache=None, validate=True):
+    key = cache.key(file_digest(path), scale_model=scale_model, validate=validate,
+                    resolution=resolution, direction=direction, width_px=width_px, height_px=height_px,
+                    width_printer=width_printer, height_printer=height_printer,
+                    slice_reverse=bool(slice_reverse), backend=backend, mode=mode, layers=workers == 1)
+
+    cached = cache.load(key)
+    if cached is not None:
+        print("Status: Loaded Slices From Cache.")
+        image, record, layers = cached
+        with open(output, 'wb') as f:
+            f.write(image)
+        save_metadata(output, record)
+        return record, layers
+
+    model = parse_file(path=path, scale_model=scale_model, cache=mesh_cache, validate=validate)
+    record, layers = slice_file(resolution, model, direction, width_px, height_px, width_printer, height_printer,
+                                slice_reverse, output, backend, workers, mode)
+
+    with open(output, 'rb') as f:
+        cache.store(key, f.read(), record, layers)
+    return record, layers
+
+# Slice a model for several views at once, each view being (direction, slice_reverse, output)
+# Every direction is cut and drawn once, views looking the other way along it are
+# stacked from the same layers in the opposite order, so each image matches slice_file
+# simplify decimates the model once for all the views, see simplify_model
+# adaptive cuts and draws a run of layers with the same section once, see slice_file
+def slice_views(resolution, model, views, width_px=None, height_px=None, width_printer=None, height_printer=None, backend='python', simplify=None, adaptive=True):
+
+    # Converstion from mm to pixels
+    width_multiplier = calculateMultiplier(width_px, width_printer)
+    height_multiplier = calculateMultiplier(height_px, height_printer)
+
+    # Switch to pixels
+    center_image = [int(width_px / 2), int(height_px / 2)]
+
+    print("Status: Calculating Slices")
+
+    obj_center_xyz = model_center(model)  # in inches
+
+    tic = time.time()
+
+    # Layers are placed from the full model, so simplifying does not move the images
+    full = model
+    model = simplify_model(model, simplify, width_multiplier, height_multiplier, resolution)
+
+    for direction in dict.fromkeys(view[0] for view in views):
+        slices = slice_positions(full, direction, resolution)
+        colors = layer_colors(len(slices))
+
+        # Of a run, the last layer shows looking forward and the first looking back
+        planes, runs = layer_runs(model, direction, slices, adaptive)
+        first = np.full(len(planes), len(slices), dtype=np.int64)
+        last = np.zeros(len(planes), dtype=np.int64)
+        np.minimum.at(first, runs, np.arange(len(slices)))
+        np.maximum.at(last, runs, np.arange(len(slices)))
+        layers = cut_layers(model, direction, planes, backend)
+
+        # One height buffer per way of looking along the direction
+        heights = {}
+        for view_direction, slice_reverse, _ in views:
+            if view_direction == direction:
+                heights.setdefault(bool(slice_reverse), np.zeros((width_px, height_px), dtype=np.uint8))
+
+        for plane_idx, vertice_sets in enumerate(layers):
+            sys.stdout.write("\r%s %d%%" % (direction, int(plane_idx / len(planes) * 100)))
+            sys.stdout.flush()
+
+            mask = layer_mask(vertice_sets, width_px, height_px, width_multiplier, height_multiplier,
+                              obj_center_xyz, center_image)
+            for slice_reverse, buffer in heights.items():
+                # Reversed, layer slice_idx is stacked len(slices) - 1 - slice_idx'th
+                color = colors[len(slices) - 1 - first[plane_idx]] if slice_reverse else colors[last[plane_idx]]
+                np.maximum(buffer, mask * np.uint8(color), out=buffer)
+
+        for view_direction, slice_reverse, output in views:
+            if view_direction == direction:
+                save_heights(heights[bool(slice_reverse)], slice_reverse, output,
+                             pixel_mm=(1 / width_multiplier, 1 / height_multiplier), direction=direction,
+                             resolution=resolution, layers=len(slices), reverse=bool(slice_reverse), mode='slices')
 
     print("\nStatus: Finished Outputting Slices")
     print('Time: ', time.time() - tic)
@@ -238,57 +426,31 @@ def generate_print_height_image(image, x, y, x_span, y_span, print_height_mm, im
     return final_image
 
 def find_starting_width(image):
-    width, height = image.size
-
-    for x in range(width):
-        for y in range(height):
-            pixel = image.getpixel((x, y))
-            if pixel != (0, 0, 0, 255):  
-                return x
+    bbox = image_metadata(np.asarray(image))['bbox']
 
     # If no non-black pixel is found, return the full width
-    return width
+    return image.size[0] if bbox is None else bbox[0]
 
 def find_starting_height(image):
-    width, height = image.size
-
-    for y in range(height):
-        for x in range(width):
-            pixel = image.getpixel((x, y))
-            if pixel != (0, 0, 0, 255):  
-                return y
+    bbox = image_metadata(np.asarray(image))['bbox']
 
     # If no non-black pixel is found, return the full height
-    return height
+    return image.size[1] if bbox is None else bbox[1]
 
 if (__name__ == '__main__'):
     res = 1.0
     model = parse_file( 
-        f=open('res/models/3DBenchyTest.STL', 'rb'), 
-        scale_model=0.05)
-    # slice_file(
-    #     resolution=res, model=model, direction='x', 
-    #     width_px=512, height_px=512, 
-    #     width_printer=200, height_printer=200,
-    #     slice_reverse=False, output='res/models/outputs/x1.png')
-    #
-    # slice_file(
-    #     resolution=res, model=model, direction='y', 
-    #     width_px=512, height_px=512, 
-    #     width_printer=200, height_printer=200,
-    #     slice_reverse=False, output='res/models/outputs/y1.png')
-    #
-    # slice_file(
-    #     resolution=res, model=model, direction='x', 
-    #     width_px=512, height_px=512, 
-    #     width_printer=200, height_printer=200,
-    #     slice_reverse=True, output='res/models/outputs/x2.png')
-    #
-    # slice_file(
-    #     resolution=res, model=model, direction='y', 
-    #     width_px=512, height_px=512, 
-    #     width_printer=200, height_printer=200,
-    #     slice_reverse=True, output='res/models/outputs/y2.png')
+        path='res/models/3DBenchyTest.STL', 
+        scale_model=0.05,
+        cache=MeshCache('res/cache/meshes'))
+    # slice_views(
+    #     resolution=res, model=model,
+    #     views=[('x', False, 'res/models/outputs/x1.png'),
+    #            ('y', False, 'res/models/outputs/y1.png'),
+    #            ('x', True, 'res/models/outputs/x2.png'),
+    #            ('y', True, 'res/models/outputs/y2.png')],
+    #     width_px=512, height_px=512,
+    #     width_printer=200, height_printer=200)
 
     (x_min, x_max), (y_min, y_max), (z_min, z_max) = model.extents()
 
@@ -297,12 +459,16 @@ if (__name__ == '__main__'):
     width = inchTomm(y_max - y_min)
     height = inchTomm(z_max - z_min)
 
-    x = find_starting_width(Image.open('res/models/outputs/x1.png'))
-    y = find_starting_height(Image.open('res/models/outputs/x1.png'))
-    elevation = 0.0
-    while (elevation < height):
-        final_print_height_image = generate_print_height_image(Image.open('res/models/outputs/x1.png'), x, y, width, height, elevation)
-        final_print_height_image.save('res/models/outputs/layers/'+str(elevation)+'.png')
-        elevation += res
+    # Where the projection starts, from the metadata written with it when there is some
+    meta = load_metadata('res/models/outputs/x1.png')
+    if meta is not None and meta['bbox'] is not None:
+        x, y = meta['bbox'][0], meta['bbox'][1]
+    else:
+        x = find_starting_width(Image.open('res/models/outputs/x1.png'))
+        y = find_starting_height(Image.open('res/models/outputs/x1.png'))
+
+    # Load the projection once and cut every elevation's mask from it
+    masks = ElevationMasks(Image.open('res/models/outputs/x1.png'), x, y, width, height)
+    masks.save_pngs('res/models/outputs/layers/', masks.elevations(height, res))
 
 